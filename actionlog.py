@@ -0,0 +1,72 @@
+import atexit
+import json
+
+
+class ActionLog:
+    """Append-only writer for the agent's action log.
+
+    Lines are buffered and written in batches of buffer_size; the Score/Hp
+    trailer is written once by close(). With fmt='jsonl' every action is a JSON
+    object on its own line and the trailer is a final {"score", "hp"} object.
+    """
+
+    def __init__(self, path='output.txt', fmt='text', buffer_size=64):
+        if fmt not in ('text', 'jsonl'):
+            raise ValueError(f"Unknown log format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.file = None
+        self.steps = 0
+        self.offset = None  # where a resumed log carries on; None starts the file afresh
+
+    def write(self, position, action):
+        if self.fmt == 'jsonl':
+            line = json.dumps({'step': self.steps, 'position': list(position), 'action': action.strip()})
+        else:
+            line = f"{position}: {action}"
+        self.steps += 1
+        self.buffer.append(line + "\n")
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.path is None:
+            self.buffer.clear()
+            return
+        if self.file is None:
+            # Opened on first flush so a previous run's log stays readable until then
+            if self.offset is None:
+                self.file = open(self.path, 'w')
+            else:
+                # Drop whatever was written after the state this log was restored from
+                self.file = open(self.path, 'r+')
+                self.file.seek(self.offset)
+                self.file.truncate()
+            atexit.register(self.flush)
+        self.file.writelines(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def __getstate__(self):
+        """Flush, and remember how far the file got instead of the open file."""
+        self.flush()
+        state = self.__dict__.copy()
+        state['file'] = None
+        if self.file is not None:
+            state['offset'] = self.file.tell()
+        return state
+
+    def close(self, score, hp):
+        """Flush what is buffered and write the final score and HP."""
+        if self.fmt == 'jsonl':
+            self.buffer.append(json.dumps({'score': score, 'hp': hp}) + "\n")
+        else:
+            self.buffer.append(f"Score: {score}\nHp: {hp}\n")
+        self.flush()
+        if self.file is not None:
+            atexit.unregister(self.flush)
+            self.file.close()
+            self.file = None
+        self.path = None
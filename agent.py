@@ -1,59 +1,65 @@
-from collections import deque
+from actionlog import ActionLog
+from beliefs import BeliefGrid
 from knowledgebase import KnowledgeBase
+from instrument import events, INFO
+from planner import FrontierPlanner
+from probability import HazardProbability
+from propositions import PIT, WUMPUS, GAS, POTION, BREEZE, STENCH, WHIFF, GLOW
+import topology
+from topology import STEP
+import world
+
+PERCEPTS = {'S': STENCH, 'B': BREEZE, 'W_H': WHIFF, 'G_L': GLOW}
+HAZARDS = {'P': PIT, 'W': WUMPUS, 'P_G': GAS, 'H_P': POTION}
+MAX_GAS_RISK = 0.5  # highest chance of gas the agent walks into when nothing safe is left
 
 class Agent:
-    def __init__(self):
-        self.kb = KnowledgeBase()
+    def __init__(self, grid_size=10, entailment=False, log_path='output.txt', log_format='text'):
+        self.grid_size = grid_size
+        self.topology = topology.grid(grid_size)
+        self.kb = KnowledgeBase(self.grid_size, entailment)
+        self.pool = self.kb.pool
         self.position = (0, 0)
         self.start_position = (0, 0)
         self.score = 0
         self.hp = 100
         self.direction = 'RIGHT'
         self.visited = set()
-        self.grid_size = 10
         self.graphic = 0
-        self.queue = deque()
-        self.queue.append(self.position)
         self.visited.add(self.position)
-        self.path = [(0, 0)]
+        self.beliefs = BeliefGrid(grid_size)
+        self.odds = HazardProbability(self.beliefs)
+        self.planner = FrontierPlanner(self.topology, self.is_safe, self.pick_risky)
+        self.done = False
         self.action_log = []
+        self.log = ActionLog(log_path, log_format)
 
     def move_forward(self):
         new_position = self.get_new_position(self.direction)
         if self.is_valid_position(new_position) and not self.is_pit(new_position):
             self.position = new_position
             self.visited.add(self.position)
-            self.queue.append(self.position)
-            self.path.append(self.position)
             self.check_cell()
-            print(f"Moved {self.direction} to {self.position}")
-            self.log_action(f"{self.position}: moveforward ")
-            self.apply_percept(self.graphic[new_position[0]][new_position[1]])
+            if events.debug:
+                events.emit('move', f"Moved {self.direction} to {self.position}")
+            self.log_action("moveforward ")
+            self.apply_percept(self.graphic.cell(*new_position))
         else:
-            print(f"Cannot move {self.direction} to {new_position}. It's either invalid or contains a pit.")
+            if events.debug:
+                events.emit('blocked', f"Cannot move {self.direction} to {new_position}. It's either invalid or contains a pit.")
 
     def get_new_position(self, direction):
-        """Return new position based on current direction."""
-        x, y = self.position
-        if direction == 'UP':
-            return (x - 1, y)
-        elif direction == 'DOWN':
-            return (x + 1, y)
-        elif direction == 'LEFT':
-            return (x, y - 1)
-        elif direction == 'RIGHT':
-            return (x, y + 1)
-        else:
+        """Return the cell ahead in direction, or None past the edge of the grid."""
+        if direction not in STEP:
             raise ValueError("Invalid direction")
-        
-
+        return self.topology.ahead(self.position, direction)
 
     def check_cell(self):
         x, y = self.position
-        cell_content = self.graphic[x][y]
+        cell_content = self.graphic.cell(x, y)
         if 'P_G' in cell_content:
             self.hp -= 25
-            self.log_action(f"{self.position}: -25 hp, HP: {self.hp}")
+            self.log_action(f"-25 hp, HP: {self.hp}")
         if 'H_P' in cell_content:
             self.collect_healing_potion()
         if 'G' in cell_content:
@@ -67,266 +73,249 @@ class Agent:
     def collect_healing_potion(self):
         self.hp = min(self.hp + 25, 100) 
         self.score -= 10
-        print(f"{self.position}: collected healing potion, HP: {self.hp}")
-        self.log_action(f"{self.position}: collected healing potion")
-        self.remove_glow_around(self.position)
-        self.graphic[self.position[0]][self.position[1]].remove('H_P')# Update the display to reflect the change
+        if events.debug:
+            events.emit('potion', f"{self.position}: collected healing potion, HP: {self.hp}")
+        self.log_action("collected healing potion")
+        self.remove_hazard(self.position, 'H_P')
 
     def collect_gold(self):
         self.score += 5000  # Example score increment
-        print(f"{self.position}: collected gold, Score: {self.score}")
-        self.log_action(f"{self.position}: collected gold")
-        self.graphic[self.position[0]][self.position[1]].remove('G')
+        if events.debug:
+            events.emit('gold', f"{self.position}: collected gold, Score: {self.score}")
+        self.log_action("collected gold")
+        self.graphic.clear(*self.position, 'G')
 
     def shoot(self):
         """Decide whether to shoot based on the KnowledgeBase and update the grid if a Wumpus is detected."""
         front_position = self.get_new_position(self.direction)
-        if 'W' in self.graphic[front_position[0]][front_position[1]]:
-            self.graphic[front_position[0]][front_position[1]].remove('W')
-            self.log_action(f"{self.position}: shot Wumpus")
+        hit = self.graphic.test(*front_position, 'W')
+        self.log_action("shot Wumpus" if hit else "shot missed")
         self.update_stench_info()
-        self.remove_stench_around(front_position)
-        print(f"Shooting Wumpus at {front_position}")
-        self.score -= 100        
-        print(f"Shot fired, Score: {self.score}")   
+        if hit:
+            self.remove_hazard(front_position, 'W')
+        # Hit or miss, there is no live wumpus in front any more
+        self.kb.add_fact(-self.pool.lit(WUMPUS, front_position))
+        if hit:
+            self.beliefs.forget(*front_position, 'W')
+        self.beliefs.rule_out(*front_position, 'W')
+        self.add_frontier(self.beliefs.take_newly_safe())
+        self.observe_cell()
+        self.score -= 100
+        if events.debug:
+            events.emit('shoot', f"Shot fired at {front_position}, Score: {self.score}")
 
     def turn_right(self):
         directions = ['UP', 'RIGHT', 'DOWN', 'LEFT']
         self.direction = directions[(directions.index(self.direction) + 1) % 4]
         self.score -= 10
-        print(f"{self.position}: turn right")
-        self.action_log.append(f"{self.position}: turn right")
+        if events.debug:
+            events.emit('turn', f"{self.position}: turn right")
+        self.log_action("turn right")
 
     def turn_left(self):
         directions = ['UP', 'LEFT', 'DOWN', 'RIGHT']
         self.direction = directions[(directions.index(self.direction) + 1) % 4]
         self.score -= 10
-        print(f"{self.position}: turn left")
-        self.action_log.append(f"{self.position}: turn left")
+        if events.debug:
+            events.emit('turn', f"{self.position}: turn left")
+        self.log_action("turn left")
 
     def is_valid_position(self, position):
-        x, y = position
-        return 0 <= x < self.grid_size and 0 <= y < self.grid_size
+        return position is not None and self.topology.contains(position)
 
     def decide_action(self):
 
-        # 1. Check if Wumpus is definitely in front
+        # 1. Shoot when a wumpus is all that can make the cell in front unsafe,
+        #    or before stepping into a risky cell that may hold one
         front_position = self.get_new_position(self.direction)
-        if self.kb.query(f"Wumpus at {front_position}"):
+        if self.is_valid_position(front_position) and (
+                self.beliefs.only_wumpus(*front_position)
+                or front_position == self.planner.risky and self.beliefs.might_be(*front_position, 'W')):
             self.shoot()
             self.move_forward()
             return
 
         # 2. Check if the agent has reached a goal or needs to return
-        if 'G' in self.graphic[self.position[0]][self.position[1]]:
+        if self.graphic.test(*self.position, 'G'):
             self.collect_gold()
             return 
 
-        # 3. Check if there is a pit nearby
-        if self.kb.query(f"Pit at {self.position}"):
-            self.avoid_pit()
-            return
-
-        # Move forward if possible
-        next_position = self.get_new_position(self.direction)
-        if self.is_valid_position(next_position) and next_position not in self.visited and not self.is_pit(next_position):
-            self.move_forward()
-            return
-
-        # Try turning right
-        self.turn_right()
-        next_position = self.get_new_position(self.direction)
-        if self.is_valid_position(next_position) and next_position not in self.visited and not self.is_pit(next_position):
-            self.move_forward()
-            return
-
-        # Try turning left twice (180 degrees)
-        self.turn_left()
-        self.turn_left()
-        next_position = self.get_new_position(self.direction)
-        if self.is_valid_position(next_position) and next_position not in self.visited and not self.is_pit(next_position):
-            self.move_forward()
-            return
-
-        # If all options fail, handle dead-end
-        print("No valid move. Backtracking or other strategy required.")
-        self.handle_dead_end()
-
-    def avoid_pit(self):
-        directions = ['UP', 'RIGHT', 'DOWN', 'LEFT']
-        original_direction = self.direction
-
-        for direction in directions:
-            if direction != original_direction:
-                next_position = self.get_new_position(direction)
-                if self.is_valid_position(next_position) and next_position not in self.visited and not self.is_pit(next_position):
-                    # Move in this direction if it is not a pit and not visited
-                    self.direction = direction
-                    self.move_forward()
-                    return
-
-        # If no valid move was found, handle dead-end or backtrack
-        print("No valid moves available to avoid pit. Handling dead-end.")
-        self.handle_dead_end()
+        # 3. Head for the cheapest safe unexplored cell, else the least risky
+        #    one, or home when there is none
+        self.follow_plan()
+
+    def follow_plan(self):
+        """Take the planner's route up to and including its next move forward."""
+        while True:
+            action = self.planner.next_action(self.position, self.direction, self.start_position)
+            if action is None:
+                if events.info:
+                    events.emit('game_over', "Returned to start position. Game over.", INFO)
+                self.done = True
+                self.finish()
+                return
+            if action == 'right':
+                self.turn_right()
+            elif action == 'left':
+                self.turn_left()
+            else:
+                self.move_forward()
+                return
 
     def is_pit(self, position):
+        """Return True unless the beliefs rule out a pit at position."""
         x, y = position
-        return 'P' in self.graphic[x][y]
-            
-
-    def handle_dead_end(self):
-
-        if self.path:
-            prev_position = self.path.pop()
-            self.position = prev_position
-            print(f"Backtracking to {self.position}")      
-        if self.position == self.start_position:
-            print("Returned to start position. Game over.")
-            self.update_log_file()
-            return
+        return self.beliefs.might_be(x, y, 'P')
+
+    def is_safe(self, position):
+        # Visited cells are safe unless they hold gas
+        return self.is_valid_position(position) and self.beliefs.safe(*position)
+
+    def pick_risky(self, position):
+        """Return the unproven cell to explore when logic proves no cell safe, or None.
+
+        move_forward never enters a possible pit, and a possible wumpus is shot
+        before the agent steps in, so the risk taken is gas: only while the
+        agent would survive it, and at most MAX_GAS_RISK. Ties go to cells
+        without a wumpus to shoot, then to the nearest.
+        """
+        gas = self.odds.estimate('P_G')
+        wumpus = self.odds.estimate('W')
+        best, best_key = None, None
+        for i in set(gas) | set(wumpus):
+            x, y = self.topology.positions[i]
+            if (x, y) in self.visited or self.beliefs.might_be(x, y, 'P'):
+                continue
+            p_gas = gas.get(i, self.odds.prior(x, y, 'P_G'))
+            if p_gas > MAX_GAS_RISK or p_gas > 0 and self.hp <= 25:
+                continue
+            distance = abs(x - position[0]) + abs(y - position[1])
+            key = (p_gas, self.beliefs.might_be(x, y, 'W'), distance, i)
+            if best_key is None or key < best_key:
+                best, best_key = (x, y), key
+        if best is not None and events.info:
+            p_wumpus = wumpus.get(best_key[3], self.odds.prior(*best, 'W'))
+            events.emit('risk', f"{position}: no safe cell left, trying {best} "
+                                f"(gas {best_key[0]:.2f}, wumpus {p_wumpus:.2f})", INFO)
+        return best
+
+    def update_frontier(self):
+        """Take the current cell into the beliefs and add the cells now known safe to the frontier."""
+        x, y = self.position
+        safe = self.beliefs.visit(x, y, self.graphic.cell(x, y))
+        if self.kb.entailment:
+            safe += self.prove_safe_neighbours()
+        self.planner.visit(self.position)
+        self.add_frontier(safe)
+
+    def add_frontier(self, cells):
+        for pos in cells:
+            if pos not in self.visited:
+                self.planner.add_frontier(pos)
+
+    def prove_safe_neighbours(self):
+        """Rule out the hazards next to the agent that the solver can refute."""
+        for pos in self.topology.neighbours(self.position):
+            if self.beliefs.safe(*pos):
+                continue
+            for element, predicate in (('P', PIT), ('W', WUMPUS), ('P_G', GAS)):
+                if self.beliefs.might_be(*pos, element) and self.kb.query(-self.pool.lit(predicate, pos)):
+                    self.beliefs.rule_out(*pos, element)
+        return self.beliefs.take_newly_safe()
+
     def apply_percept(self, percepts):
         
         for percept in percepts:
-            print(percept)
+            if events.debug:
+                events.emit('percept', f"{self.position}: {percept}")
             if percept == 'S':
-                self.kb.add_fact(f"Stench at {self.position}")
+                self.kb.add_fact(self.pool.lit(STENCH, self.position))
                 self.add_stench_rules()
             elif percept == 'B':
-                self.kb.add_fact(f"Breeze at {self.position}")
+                self.kb.add_fact(self.pool.lit(BREEZE, self.position))
                 self.add_breeze_rules()
             elif percept == 'W_H':
-                self.kb.add_fact(f"Whiff at {self.position}")
+                self.kb.add_fact(self.pool.lit(WHIFF, self.position))
                 self.add_whiff_rules()
-            elif percept == 'G':
-                self.kb.add_fact(f"Glow at {self.position}")
+            elif percept == 'G_L':
+                self.kb.add_fact(self.pool.lit(GLOW, self.position))
                 self.add_glow_rules()
+        self.observe_cell()
+        self.update_frontier()
 
-    def add_breeze_rules(self):
+    def observe_cell(self):
+        """Tell the KB every percept present or absent at the current cell.
+
+        The agent also knows what is in the cell it stands on, which settles
+        the rules that guessed at it.
+        """
         x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if self.is_valid_position((px, py)):
-                self.kb.add_implication(f"Breeze at {self.position}", f"Pit at {(px, py)}")
+        contents = self.graphic.cell(x, y)
+        for element, predicate in HAZARDS.items():
+            lit = self.pool.lit(predicate, self.position)
+            self.kb.add_fact(lit if element in contents else -lit)
+        self.kb.observe(self.position, {PERCEPTS[p] for p in contents if p in PERCEPTS})
+
+    def add_breeze_rules(self):
+        breeze = self.pool.lit(BREEZE, self.position)
+        for pos in self.topology.sensed_from(self.position, self.direction):
+            self.kb.add_implication(breeze, self.pool.lit(PIT, pos))
 
     def add_stench_rules(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if self.is_valid_position((px, py)):
-                self.kb.add_implication(f"Stench at {self.position}", f"Wumpus at {(px, py)}")
+        stench = self.pool.lit(STENCH, self.position)
+        for pos in self.topology.sensed_from(self.position, self.direction):
+            self.kb.add_implication(stench, self.pool.lit(WUMPUS, pos))
 
     def add_whiff_rules(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if self.is_valid_position((px, py)):
-                self.kb.add_implication(f"Whiff at {self.position}", f"Gas at {(px, py)}")
+        whiff = self.pool.lit(WHIFF, self.position)
+        for pos in self.topology.sensed_from(self.position, self.direction):
+            self.kb.add_implication(whiff, self.pool.lit(GAS, pos))
 
     def add_glow_rules(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if self.is_valid_position((px, py)):
-                self.kb.add_implication(f"Glow at {self.position}", f"Potion at {(px, py)}")
+        glow = self.pool.lit(GLOW, self.position)
+        for pos in self.topology.sensed_from(self.position, self.direction):
+            self.kb.add_implication(glow, self.pool.lit(POTION, pos))
 
     def update_stench_info(self):
-        x, y = self.position
-        adjacent_positions = [
-            (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)
-        ]
-        if not self.kb.query(f"Stench at {self.position}"):
+        if not self.kb.query(self.pool.lit(STENCH, self.position)):
             # No stench detected, so there should be no Wumpus in adjacent cells
-            for pos in adjacent_positions:
-                if self.is_valid_position(pos):
-                    self.kb.remove_fact(f"Wumpus at {pos}")
+            for pos in self.topology.neighbours(self.position):
+                self.kb.remove_fact(self.pool.lit(WUMPUS, pos))
 
     def update_gas_info(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if not self.kb.query(f"Whiff at {self.position}"):
-                self.kb.remove_fact(f"Gas at {(px, py)}")
+        if not self.kb.query(self.pool.lit(WHIFF, self.position)):
+            for pos in self.topology.sensed_from(self.position, self.direction):
+                self.kb.remove_fact(self.pool.lit(GAS, pos))
 
     def update_pit_info(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for px, py in directions[self.direction]:
-            if not self.kb.query(f"Breeze at {self.position}"):
-                self.kb.remove_fact(f"Pit at {(px, py)}")
+        if not self.kb.query(self.pool.lit(BREEZE, self.position)):
+            for pos in self.topology.sensed_from(self.position, self.direction):
+                self.kb.remove_fact(self.pool.lit(PIT, pos))
 
     def update_potion_info(self):
-        x, y = self.position
-        directions = {
-            'UP': [(x-1, y), (x, y-1), (x, y+1)],
-            'DOWN': [(x+1, y), (x, y-1), (x, y+1)],
-            'LEFT': [(x, y-1), (x-1, y), (x+1, y)],
-            'RIGHT': [(x, y+1), (x-1, y), (x+1, y)]
-        }
-        for pos in directions[self.direction]:
-            if not self.kb.query(f"Glow at {pos}"):
-                self.kb.remove_fact(f"Potion at {pos}")
+        for pos in self.topology.sensed_from(self.position, self.direction):
+            if not self.kb.query(self.pool.lit(GLOW, pos)):
+                self.kb.remove_fact(self.pool.lit(POTION, pos))
+
     def update_knowledge_base(self):
         self.update_stench_info()
         self.update_gas_info()
         self.update_pit_info()
         self.update_potion_info()
-    def remove_stench_around(self, position):
-        x, y = position
-        adjacent_positions = [
-            (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)
-        ]
-        for pos in adjacent_positions:
-            if self.is_valid_position(pos):
-                if 'S' in self.graphic[pos[0]][pos[1]]:
-                    self.graphic[pos[0]][pos[1]].remove('S')
-
-    def remove_glow_around(self, position):
-        x, y = position
-        adjacent_positions = [
-            (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)
-        ]
-        for pos in adjacent_positions:
-            if self.is_valid_position(pos):
-                if 'G_L' in self.graphic[pos[0]][pos[1]]:
-                    self.graphic[pos[0]][pos[1]].remove('G_L')
-
-    def log_action(self, message):
-        self.action_log.append(message)
-        self.update_log_file()
-
-    def update_log_file(self):
-        with open("output.txt", "w") as file:
-            for log in self.action_log:
-                file.write(f"{log}\n")
-            file.write(f"Score: {self.score}\n")
-            file.write(f"Hp: {self.hp}\n")
\ No newline at end of file
+    def remove_hazard(self, position, element):
+        """Take a hazard off the grid and retract the percepts that went out with it.
+
+        Cells next to another hazard of the same kind keep their percept.
+        """
+        changed = self.graphic.remove_hazard(*position, element)
+        percept = PERCEPTS[world.PERCEPTS[element]]
+        self.kb.retract([self.pool.lit(percept, pos) for pos in changed])
+        return changed
+
+    def log_action(self, action):
+        self.action_log.append(f"{self.position}: {action}")
+        self.log.write(self.position, action)
+
+    def finish(self):
+        """Flush the action log and write the final score and HP."""
+        self.log.close(self.score, self.hp)
@@ -0,0 +1,93 @@
+import queue
+import threading
+from collections import namedtuple
+import world
+
+# One agent step as seen by the renderer; changes is a tuple of (x, y, mask)
+Snapshot = namedtuple('Snapshot', 'step changes position direction score hp log_lines done')
+
+
+class AgentWorker(threading.Thread):
+    """Run Agent.decide_action in its own thread and publish a Snapshot per step.
+
+    Snapshots go to a bounded queue, so an agent that gets far ahead of the
+    renderer waits for it instead of buffering without limit.
+    """
+
+    def __init__(self, agent, grid, queue_size=256):
+        super().__init__(daemon=True)
+        self.agent = agent
+        self.grid = grid
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        agent = self.agent
+        shadow = self.grid.snapshot()
+        logged = len(agent.action_log)
+        step = 0
+        while not self.stopped.is_set():
+            if not agent.done and agent.hp > 0:
+                agent.decide_action()
+                step += 1
+            changed = self.grid.diff(shadow)
+            if changed:
+                shadow = self.grid.snapshot()
+            done = agent.done or agent.hp <= 0
+            snapshot = Snapshot(step, tuple((x, y, self.grid.mask(x, y)) for x, y in changed), agent.position,
+                                agent.direction, agent.score, agent.hp, tuple(agent.action_log[logged:]), done)
+            logged = len(agent.action_log)
+            self.publish(snapshot)
+            if done:
+                break
+
+    def publish(self, snapshot):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(snapshot, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class AgentView:
+    """The renderer's copy of the agent state, advanced by applying Snapshots.
+
+    It has the attributes Graphic draws from (position, direction, score, hp,
+    action_log, done), and its own grid, so drawing never reads state the
+    worker thread is changing.
+    """
+
+    def __init__(self, agent, grid):
+        self.N = grid.N
+        self.grid = world.BitGrid(grid.N)
+        self.grid.restore(grid.snapshot())
+        self.position = agent.position
+        self.direction = agent.direction
+        self.score = agent.score
+        self.hp = agent.hp
+        self.action_log = list(agent.action_log)
+        self.done = False
+
+    def apply(self, snapshot):
+        for x, y, mask in snapshot.changes:
+            self.grid.set_mask(x, y, mask)
+        self.position = snapshot.position
+        self.direction = snapshot.direction
+        self.score = snapshot.score
+        self.hp = snapshot.hp
+        self.action_log.extend(snapshot.log_lines)
+        self.done = snapshot.done
+
+    def drain(self, snapshots):
+        """Apply every snapshot waiting in the queue; return how many there were."""
+        count = 0
+        while True:
+            try:
+                self.apply(snapshots.get_nowait())
+            except queue.Empty:
+                return count
+            count += 1
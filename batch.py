@@ -0,0 +1,79 @@
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from instrument import events, WARNING
+from journal import run_journaled
+from simulator import Simulator
+
+COLUMNS = ('level', 'score', 'hp', 'steps', 'time', 'outcome')
+
+
+def find_levels(pattern):
+    """Return the level files in a directory, or those matching a glob pattern."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.txt')
+    return sorted(glob.glob(pattern))
+
+
+def output_name(file_path, root=None):
+    """Return the level's path relative to root, without its extension; root defaults to its directory."""
+    file_path = os.path.abspath(file_path)
+    return os.path.splitext(os.path.relpath(file_path, root or os.path.dirname(file_path)))[0]
+
+
+def run_level(file_path, output_dir, entailment=False, log_format='text', journal=False, root=None):
+    """Play one level headless and return its summary row.
+
+    Its log goes to output_dir under the level's path relative to root, so
+    levels of the same name in different directories do not share files.
+    With journal, the run is journaled next to its log, and a run that was
+    cut short carries on from its last checkpoint.
+    """
+    base = os.path.join(output_dir, output_name(file_path, root))
+    extension = '.jsonl' if log_format == 'jsonl' else '.txt'
+    log_path = base + extension
+    try:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        # Forked workers inherit the parent's log level; keep them quiet
+        events.configure(level=WARNING)
+        if journal:
+            result = run_journaled(base + '.journal', file_path,
+                                   entailment=entailment, log_path=log_path, log_format=log_format)
+        else:
+            result = Simulator(file_path, entailment=entailment, log_path=log_path, log_format=log_format).run()
+    except Exception as e:
+        return {'level': file_path, 'score': None, 'hp': None, 'steps': None, 'time': None,
+                'outcome': f"error: {e}"}
+    return {'level': file_path, 'score': result.score, 'hp': result.hp, 'steps': result.steps,
+            'time': round(result.elapsed, 4), 'outcome': result.outcome}
+
+
+def run_batch(levels, output_dir, workers=None, entailment=False, log_format='text', journal=False):
+    """Play every level in a process pool, one log file per level in output_dir.
+
+    Logs are laid out as the levels are below their common directory.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n = len(levels)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(level)) for level in levels]) if levels else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(run_level, levels, [output_dir] * n, [entailment] * n, [log_format] * n,
+                             [journal] * n, [root] * n))
+    write_summary(rows, os.path.join(output_dir, 'summary.csv'))
+    return rows
+
+
+def write_summary(rows, file_path, columns=COLUMNS):
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(rows, columns=COLUMNS):
+    """Return the summary rows as an aligned text table."""
+    table = [columns] + [tuple('' if row[c] is None else str(row[c]) for c in columns) for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip()
+                     for line in table)
@@ -0,0 +1,142 @@
+from array import array
+import topology
+
+# Status bits of a cell, as far as the agent knows
+VISITED = 1 << 0
+NO_PIT, NO_WUMPUS, NO_GAS = 1 << 1, 1 << 2, 1 << 3
+MAYBE_PIT, MAYBE_WUMPUS, MAYBE_GAS = 1 << 4, 1 << 5, 1 << 6
+PIT, WUMPUS, GAS = 1 << 7, 1 << 8, 1 << 9  # confirmed
+SAFE = NO_PIT | NO_WUMPUS | NO_GAS
+
+# hazard element -> (ruled out, possible, confirmed, sensed bit, percept element)
+HAZARDS = {
+    'P': (NO_PIT, MAYBE_PIT, PIT, 1, 'B'),
+    'W': (NO_WUMPUS, MAYBE_WUMPUS, WUMPUS, 2, 'S'),
+    'P_G': (NO_GAS, MAYBE_GAS, GAS, 4, 'W_H'),
+}
+STATUS_NAMES = ((VISITED, 'visited'), (PIT, 'pit'), (WUMPUS, 'wumpus'), (GAS, 'gas'),
+                (MAYBE_PIT, 'possibly pit'), (MAYBE_WUMPUS, 'possibly wumpus'), (MAYBE_GAS, 'possibly gas'))
+
+
+class BeliefGrid:
+    """What the agent has worked out about every cell, as status bits in a flat array.
+
+    Visiting a cell rules out the hazards whose percept is missing there in all
+    four neighbours, and marks the others as possible. A hazard is confirmed
+    when only one neighbour of a cell sensing its percept is left that could
+    hold it. Each change only looks at the cells next to it, and lookups are
+    one array read. The sensing cells whose constraint a change may have
+    touched are collected per hazard for HazardProbability to take.
+    """
+
+    def __init__(self, N):
+        self.N = N
+        self.topology = topology.grid(N)
+        self.status = array('H', bytes(2 * N * N))
+        self.sensed = bytearray(N * N)  # sensed bits of the percepts felt at visited cells
+        self.newly_safe = []
+        self.changed = {element: set() for element in HAZARDS}  # see take_changed()
+
+    def neighbours(self, x, y):
+        return self.topology.around[x * self.N + y]
+
+    def test(self, x, y, flag):
+        return self.status[x * self.N + y] & flag != 0
+
+    def safe(self, x, y):
+        return self.status[x * self.N + y] & SAFE == SAFE
+
+    def might_be(self, x, y, element):
+        """Return True unless the hazard is ruled out in (x, y)."""
+        return self.status[x * self.N + y] & HAZARDS[element][0] == 0
+
+    def only_wumpus(self, x, y):
+        """Return True if (x, y) may hold a wumpus and would be safe without it."""
+        status = self.status[x * self.N + y]
+        return (status & (NO_PIT | NO_GAS) == NO_PIT | NO_GAS and not status & NO_WUMPUS
+                and status & (MAYBE_WUMPUS | WUMPUS) != 0)
+
+    def describe(self, x, y):
+        status = self.status[x * self.N + y]
+        if status & SAFE == SAFE:
+            names = ['safe']
+        else:
+            names = []
+        names += [name for flag, name in STATUS_NAMES if status & flag]
+        return ', '.join(names) or 'unknown'
+
+    def visit(self, x, y, contents):
+        """Take in a visited cell's contents and percepts; return the cells that became safe."""
+        i = x * self.N + y
+        self.status[i] |= VISITED
+        sensed = 0
+        for element, (_, _, _, bit, percept) in HAZARDS.items():
+            if element in contents:
+                self.confirm(x, y, element)
+            else:
+                self.rule_out(x, y, element)
+            if percept in contents:
+                sensed |= bit
+        felt, self.sensed[i] = self.sensed[i], sensed
+        for element, (ruled_out, maybe, _, bit, _) in HAZARDS.items():
+            if (sensed | felt) & bit:
+                self.changed[element].add(i)
+            if not sensed & bit:
+                for nx, ny in self.neighbours(x, y):
+                    self.rule_out(nx, ny, element)
+                continue
+            for nx, ny in self.neighbours(x, y):
+                j = nx * self.N + ny
+                if not self.status[j] & ruled_out:
+                    self.status[j] |= maybe
+            self.check_single(x, y, element)
+        return self.take_newly_safe()
+
+    def rule_out(self, x, y, element):
+        """Record that (x, y) has no such hazard, and revisit the sensing cells around it."""
+        ruled_out, maybe, confirmed, bit, _ = HAZARDS[element]
+        i = x * self.N + y
+        if self.status[i] & ruled_out:
+            return
+        self.status[i] = (self.status[i] | ruled_out) & ~(maybe | confirmed)
+        if self.status[i] & SAFE == SAFE:
+            self.newly_safe.append((x, y))
+        changed = self.changed[element]
+        for nx, ny in self.neighbours(x, y):
+            j = nx * self.N + ny
+            if self.sensed[j] & bit:
+                changed.add(j)
+                self.check_single(nx, ny, element)
+
+    def confirm(self, x, y, element):
+        ruled_out, maybe, confirmed, bit, _ = HAZARDS[element]
+        i = x * self.N + y
+        self.status[i] = (self.status[i] | confirmed) & ~(maybe | ruled_out)
+        for j in self.topology.neighbour_ids(i):
+            if self.sensed[j] & bit:
+                self.changed[element].add(j)
+
+    def check_single(self, x, y, element):
+        """Confirm the hazard next to (x, y) if only one neighbour can still hold it."""
+        ruled_out = HAZARDS[element][0]
+        candidates = [(nx, ny) for nx, ny in self.neighbours(x, y) if not self.status[nx * self.N + ny] & ruled_out]
+        if len(candidates) == 1:
+            self.confirm(*candidates[0], element)
+
+    def forget(self, x, y, element):
+        """Stop trusting the percepts sensed around (x, y), e.g. once its wumpus is shot."""
+        bit = HAZARDS[element][3]
+        for nx, ny in self.neighbours(x, y):
+            j = nx * self.N + ny
+            if self.sensed[j] & bit:
+                self.sensed[j] &= ~bit
+                self.changed[element].add(j)
+
+    def take_changed(self, element):
+        """Return the sensing cells whose constraint on element may have changed since the last call."""
+        cells, self.changed[element] = self.changed[element], set()
+        return cells
+
+    def take_newly_safe(self):
+        cells, self.newly_safe = self.newly_safe, []
+        return cells
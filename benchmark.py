@@ -0,0 +1,292 @@
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+import levelgen
+import world
+from actionlog import ActionLog
+from knowledgebase import KnowledgeBase
+from simulator import Simulator
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not on Windows; peak RSS is then read from /proc or left out
+    resource = None
+
+SIZES = (10, 50, 100, 500)
+KB_RULES = (1000, 10000, 100000)  # up to 10**6 with --kb-rules
+PERCEPT_SIZES = (20, 100)
+LOG_LINES = 100000
+REPEAT = 5           # micro benchmarks report the median of this many samples
+INSERTS_PER_SAMPLE = 100000  # rule inserts timed per sample, over as many knowledge bases as it takes
+THRESHOLD = 0.10     # a metric more than 10% worse than the baseline is a regression
+HIGHER_IS_BETTER = ('_per_s',)  # metric name suffixes; every other metric is better lower
+
+
+def run_size(N, seed, entailment, max_steps, repeat=1):
+    """Generate an N x N level and time headless runs on it, keeping the fastest of repeat.
+
+    Runs in its own process so the peak RSS belongs to this size alone.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, f'level_{N}.txt')
+        levelgen.write_level(file_path, N, seed)
+        result = None
+        for _ in range(repeat):
+            simulator = Simulator(file_path, max_steps=max_steps, entailment=entailment, log_path=None)
+            run = simulator.run()
+            if result is None or run.elapsed < result.elapsed:
+                result = run
+    kb = simulator.agent.kb
+    return {
+        'N': N,
+        'steps': result.steps,
+        'outcome': result.outcome,
+        'time': result.elapsed,
+        'decisions_per_s': result.steps / result.elapsed if result.elapsed else 0.0,
+        'ms_per_step': 1000 * result.elapsed / result.steps if result.steps else 0.0,
+        'kb_facts': len(kb.facts),
+        'kb_rules': kb.rule_count,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def peak_rss_mb():
+    """Return this process's peak RSS in MB, or None where it cannot be read.
+
+    VmHWM belongs to the process's own address space, while ru_maxrss
+    carries the parent's high-water mark over fork and exec on Linux, so it
+    is only the fallback where there is no /proc.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB elsewhere
+
+
+def run_benchmark(sizes=SIZES, seed=0, entailment=False, max_steps=100000, repeat=1):
+    rows = []
+    context = multiprocessing.get_context('spawn')
+    for N in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            rows.append(pool.submit(run_size, N, seed, entailment, max_steps, repeat).result())
+    return rows
+
+
+def format_rows(rows):
+    header = f"{'N':>5} {'steps':>9} {'outcome':>10} {'time s':>9} {'dec/s':>10} {'ms/step':>8} {'facts':>8} {'rules':>8} {'RSS MB':>8}"
+    lines = [header]
+    for r in rows:
+        rss = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.1f}"
+        lines.append(f"{r['N']:>5} {r['steps']:>9} {r['outcome']:>10} {r['time']:>9.3f} {r['decisions_per_s']:>10.0f} "
+                     f"{r['ms_per_step']:>8.4f} {r['kb_facts']:>8} {r['kb_rules']:>8} {rss:>8}")
+    return "\n".join(lines)
+
+
+def median_time(function, repeat=REPEAT):
+    """Return the median time of one call of function, in seconds.
+
+    Each of the repeat samples calls function as many times as
+    timeit.Timer.autorange() finds takes 0.2 s, so fast functions are not
+    timed one clock tick at a time.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return statistics.median(timer.repeat(repeat, number)) / number
+
+
+def bench_kb(rules, seed=0, facts=100, queries=10000, repeat=REPEAT):
+    """Time KnowledgeBase rule and fact inserts, queries and forward chaining with `rules` random rules."""
+    rng = random.Random(seed)
+    grid_size = max(10, math.isqrt(rules // 16) + 1)  # about two rules per variable, so rules chain
+    top = KnowledgeBase(grid_size).pool.top
+    pairs = [(rng.randint(1, top), rng.choice((1, -1)) * rng.randint(1, top)) for _ in range(rules)]
+    asserted = rng.sample(range(1, top + 1), facts)
+    loops = max(1, INSERTS_PER_SAMPLE // rules)
+    inserts = []
+    add_facts = []
+    for _ in range(repeat):
+        kbs = [KnowledgeBase(grid_size) for _ in range(loops)]
+        gc.disable()  # as timeit does
+        start = time.perf_counter()
+        for kb in kbs:
+            for premise, conclusion in pairs:
+                kb.add_implication(premise, conclusion)
+        middle = time.perf_counter()
+        for kb in kbs:
+            for fact in asserted:
+                kb.add_fact(fact)
+        end = time.perf_counter()
+        gc.enable()
+        inserts.append((middle - start) / loops)
+        add_facts.append((end - middle) / loops)
+    insert = statistics.median(inserts)
+    add_fact = statistics.median(add_facts)
+
+    lits = [rng.choice((1, -1)) * rng.randint(1, top) for _ in range(queries)]
+    query = median_time(lambda: [kb.query(lit) for lit in lits], repeat)
+
+    def chain():
+        # Derive everything again from the asserted facts alone
+        kb.facts = set(kb.asserted)
+        kb.agenda.extend(kb.asserted)
+        kb.apply_logic()
+    apply_logic = median_time(chain, repeat)
+    return {
+        f'kb[{rules}].insert_us': 1e6 * insert / rules,
+        f'kb[{rules}].add_fact_us': 1e6 * add_fact / facts,
+        f'kb[{rules}].query_us': 1e6 * query / queries,
+        f'kb[{rules}].apply_logic_ms': 1e3 * apply_logic,
+        f'kb[{rules}].derived_facts': len(kb.facts),
+    }
+
+
+def bench_percepts(N, seed=0, toggles=1000):
+    """Time counting every percept of an N x N level, and adding and removing single hazards."""
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, f'level_{N}.txt')
+        levelgen.write_level(file_path, N, seed)
+        _, grid = world.read_level(file_path, cache=False)
+    update = median_time(grid.update_percepts)
+    rng = random.Random(seed)
+    cells = [(rng.randrange(N), rng.randrange(N), rng.choice(world.HAZARDS)) for _ in range(toggles)]
+
+    def toggle():
+        for x, y, element in cells:
+            if grid.test(x, y, element):
+                grid.remove_hazard(x, y, element)
+                grid.add_hazard(x, y, element)
+            else:
+                grid.add_hazard(x, y, element)
+                grid.remove_hazard(x, y, element)
+    return {
+        f'percepts[{N}].update_ms': 1e3 * update,
+        f'percepts[{N}].toggle_us': 1e6 * median_time(toggle) / toggles,
+    }
+
+
+def bench_log(fmt, lines=LOG_LINES):
+    """Time writing an action log of `lines` actions in the given format."""
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, 'log')
+
+        def write():
+            log = ActionLog(file_path, fmt)
+            for i in range(lines):
+                log.write((i % 100, i // 100 % 100), "moveforward ")
+            log.close(0, 100)
+        seconds = median_time(write)
+    return {f'log[{fmt}].lines_per_s': lines / seconds}
+
+
+def run_micro(kb_rules=KB_RULES, percept_sizes=PERCEPT_SIZES, seed=0):
+    metrics = {}
+    for rules in kb_rules:
+        metrics.update(bench_kb(rules, seed))
+    for N in percept_sizes:
+        metrics.update(bench_percepts(N, seed))
+    for fmt in ('text', 'jsonl'):
+        metrics.update(bench_log(fmt))
+    return metrics
+
+
+def macro_metrics(rows):
+    metrics = {}
+    for r in rows:
+        metrics[f"game[{r['N']}].time_s"] = r['time']
+        metrics[f"game[{r['N']}].decisions_per_s"] = r['decisions_per_s']
+        if r['peak_rss_mb'] is not None:
+            metrics[f"game[{r['N']}].peak_rss_mb"] = r['peak_rss_mb']
+    return metrics
+
+
+def compare(metrics, baseline, threshold=THRESHOLD):
+    """Return (name, baseline, current, change) for every metric found in both, and the regressions among them.
+
+    change is the relative change in the metric's better direction, so a
+    negative change is a slowdown; a regression is one below -threshold.
+    Counts such as derived_facts are compared for information only.
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(metrics) & set(baseline)):
+        old, new = baseline[name], metrics[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        if not name.endswith(HIGHER_IS_BETTER):
+            change = -change
+        rows.append((name, old, new, change))
+        timed = name.rsplit('.', 1)[-1] != 'derived_facts'
+        if timed and change < -threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_comparison(rows, regressions):
+    lines = [f"{'metric':<34} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for name, old, new, change in rows:
+        flag = '  REGRESSION' if name in regressions else ''
+        lines.append(f"{name:<34} {old:>12.4f} {new:>12.4f} {100 * change:>+7.1f}%{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro and macro benchmarks of the agent, with baseline comparison')
+    parser.add_argument('--suite', choices=('micro', 'macro', 'all'), default='all')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='level sizes of the macro runs')
+    parser.add_argument('--kb-rules', type=int, nargs='+', default=list(KB_RULES))
+    parser.add_argument('--percept-sizes', type=int, nargs='+', default=list(PERCEPT_SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--entailment', action='store_true')
+    parser.add_argument('--max-steps', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3, help='macro runs per size; the fastest is kept')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='relative slowdown that counts as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    metrics = {}
+    rows = []
+    if args.suite in ('micro', 'all'):
+        metrics.update(run_micro(args.kb_rules, args.percept_sizes, args.seed))
+        print("\n".join(f"{name:<34} {value:>12.4f}" for name, value in metrics.items()))
+    if args.suite in ('macro', 'all'):
+        rows = run_benchmark(args.sizes, args.seed, args.entailment, args.max_steps, args.repeat)
+        metrics.update(macro_metrics(rows))
+        print(format_rows(rows))
+
+    results = {'python': platform.python_version(), 'machine': platform.machine(), 'seed': args.seed,
+               'entailment': args.entailment, 'metrics': metrics, 'macro': rows}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        comparison, regressions = compare(metrics, baseline, args.threshold)
+        print(format_comparison(comparison, regressions))
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {100 * args.threshold:.0f}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
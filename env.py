@@ -0,0 +1,173 @@
+import numpy as np
+import levelgen
+import world
+from world import BIT, ELEMENTS, PERCEPTS, near_any
+
+FORWARD, TURN_LEFT, TURN_RIGHT, SHOOT, CLIMB = range(5)
+# Row/column step per direction, indexed UP, RIGHT, DOWN, LEFT as in topology.DIRECTIONS
+DX = np.array([-1, 0, 1, 0])
+DY = np.array([0, 1, 0, -1])
+BITS = np.arange(len(ELEMENTS), dtype=np.uint16)
+
+
+def random_worlds(rng, count, N, densities=None):
+    """Return (count, N, N) cell masks drawn like levelgen.generate_level, percepts included."""
+    densities = levelgen.DENSITIES if densities is None else densities
+    r = rng.random((count, N, N))
+    cells = np.zeros((count, N, N), dtype=np.uint16)
+    low = 0.0
+    for element, density in densities.items():
+        cells[(r >= low) & (r < low + density)] |= BIT[element]
+        low += density
+    cells[:, 0, 0] = 0
+    add_percepts(cells)
+    return cells
+
+
+def add_percepts(cells, elements=PERCEPTS):
+    """Recompute the percept planes of the given hazards in place."""
+    for element in elements:
+        percept = BIT[PERCEPTS[element]]
+        near = near_any((cells & BIT[element]) != 0)
+        cells &= ~np.uint16(percept)
+        cells |= np.where(near, percept, 0).astype(np.uint16)
+
+
+class VectorWumpusEnv:
+    """Step many Wumpus worlds at once with NumPy operations over a (B, N, N) tensor.
+
+    Actions are FORWARD, TURN_LEFT, TURN_RIGHT, SHOOT and CLIMB, and the reward
+    is the change in score under Agent's rules: -10 per turn, -100 per shot,
+    +5000 for gold, -10 for a potion (which heals 25 HP up to 100), -25 HP in
+    gas and -10000 for walking onto a wumpus. Like Agent.move_forward, moving
+    into a wall or a pit leaves the agent where it is. An episode ends when HP
+    drops to 0, the agent climbs out at (0, 0) or max_steps is reached.
+    Observations are the element bits (W, P, G, P_G, H_P, S, B, W_H, G_L) of
+    the agent's cell.
+    """
+
+    def __init__(self, num_envs, N=10, densities=None, max_steps=1000, autoreset=False):
+        self.num_envs = num_envs
+        self.N = N
+        self.densities = densities
+        self.max_steps = max_steps
+        self.autoreset = autoreset
+        self.rng = np.random.default_rng()
+        self.index = np.arange(num_envs)
+
+    def reset(self, seed=None, worlds=None):
+        """Start new episodes; worlds can give the (B, N, N) cell masks to use."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if worlds is None:
+            self.cells = random_worlds(self.rng, self.num_envs, self.N, self.densities)
+        else:
+            self.cells = np.array(worlds, dtype=np.uint16).reshape(self.num_envs, self.N, self.N)
+        B = self.num_envs
+        self.x = np.zeros(B, dtype=np.int64)
+        self.y = np.zeros(B, dtype=np.int64)
+        self.direction = np.ones(B, dtype=np.int64)  # RIGHT, like Agent
+        self.score = np.zeros(B, dtype=np.int64)
+        self.hp = np.full(B, 100, dtype=np.int64)
+        self.steps = np.zeros(B, dtype=np.int64)
+        self.done = np.zeros(B, dtype=bool)
+        return self.observe()
+
+    def observe(self):
+        masks = self.cells[self.index, self.x, self.y]
+        return ((masks[:, None] >> BITS) & 1).astype(np.uint8)
+
+    def step(self, actions):
+        """Apply one action per world; returns (observations, rewards, dones, info)."""
+        actions = np.asarray(actions)
+        active = ~self.done
+        reward = np.zeros(self.num_envs, dtype=np.int64)
+        cells = self.cells
+
+        left = active & (actions == TURN_LEFT)
+        right = active & (actions == TURN_RIGHT)
+        self.direction[left] = (self.direction[left] - 1) % 4
+        self.direction[right] = (self.direction[right] + 1) % 4
+        reward[left | right] -= 10
+
+        fx = self.x + DX[self.direction]
+        fy = self.y + DY[self.direction]
+        inside = (fx >= 0) & (fx < self.N) & (fy >= 0) & (fy < self.N)
+        fx = np.clip(fx, 0, self.N - 1)
+        fy = np.clip(fy, 0, self.N - 1)
+        front = cells[self.index, fx, fy]
+
+        moved = active & (actions == FORWARD) & inside & ((front & BIT['P']) == 0)
+        self.x[moved] = fx[moved]
+        self.y[moved] = fy[moved]
+        here = cells[self.index, self.x, self.y]
+        self.hp[moved & ((here & BIT['P_G']) != 0)] -= 25
+        potion = moved & ((here & BIT['H_P']) != 0)
+        if potion.any():
+            self.hp[potion] = np.minimum(self.hp[potion] + 25, 100)
+            reward[potion] -= 10
+            cells[potion, self.x[potion], self.y[potion]] &= ~np.uint16(BIT['H_P'])
+            sub = cells[potion]
+            add_percepts(sub, ('H_P',))
+            cells[potion] = sub
+        gold = moved & ((here & BIT['G']) != 0)
+        reward[gold] += 5000
+        cells[gold, self.x[gold], self.y[gold]] &= ~np.uint16(BIT['G'])
+        reward[moved & ((here & BIT['W']) != 0)] -= 10000
+
+        shoot = active & (actions == SHOOT)
+        reward[shoot] -= 100
+        hit = shoot & inside & ((front & BIT['W']) != 0)
+        if hit.any():
+            cells[hit, fx[hit], fy[hit]] &= ~np.uint16(BIT['W'])
+            sub = cells[hit]
+            add_percepts(sub, ('W',))
+            cells[hit] = sub
+
+        climbed = active & (actions == CLIMB) & (self.x == 0) & (self.y == 0)
+        self.score += reward
+        self.steps[active] += 1
+        truncated = active & (self.steps >= self.max_steps)
+        finished = active & ((self.hp <= 0) | climbed | truncated)
+        self.done |= finished
+        info = {'score': self.score.copy(), 'hp': self.hp.copy(), 'truncated': truncated}
+        dones = finished.copy()
+        if self.autoreset and finished.any():
+            self.reset_worlds(finished)
+        return self.observe(), reward, dones, info
+
+    def reset_worlds(self, which):
+        """Give the selected worlds a fresh level and agent."""
+        count = int(which.sum())
+        self.cells[which] = random_worlds(self.rng, count, self.N, self.densities)
+        self.x[which] = 0
+        self.y[which] = 0
+        self.direction[which] = 1
+        self.score[which] = 0
+        self.hp[which] = 100
+        self.steps[which] = 0
+        self.done[which] = False
+
+
+class WumpusEnv:
+    """Single-world environment with the same rules as VectorWumpusEnv.
+
+    With level_path the world is read from a level file; otherwise every
+    reset(seed) draws a new random level of size N.
+    """
+
+    def __init__(self, level_path=None, N=10, densities=None, max_steps=1000):
+        self.level_path = level_path
+        if level_path is not None:
+            N, grid = world.read_level(level_path)
+            grid.update_percepts()
+            self.level = grid.cells
+        self.vector = VectorWumpusEnv(1, N, densities, max_steps)
+
+    def reset(self, seed=None):
+        worlds = None if self.level_path is None else self.level[None]
+        return self.vector.reset(seed, worlds)[0]
+
+    def step(self, action):
+        obs, reward, done, info = self.vector.step([action])
+        return obs[0], int(reward[0]), bool(done[0]), {key: value[0] for key, value in info.items()}
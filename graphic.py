@@ -1,9 +1,44 @@
-import pygame
+import hashlib
+import os
 import sys
 from agent import Agent
+from agentworker import AgentWorker, AgentView
+import world
+
+pygame = None  # imported by Graphic(), so importing this module does not start pygame
+
+ASSET_DIR = './asset'
+SPRITES = {'W': 'wumpus.png', 'G': 'gold.png', 'P': 'pit.png', 'P_G': 'gas.png', 'H_P': 'potion.png',
+           'UP': 'agent_up.png', 'DOWN': 'agent_down.png', 'LEFT': 'agent_left.png', 'RIGHT': 'agent_right.png'}
+OVERLAYS = ('S', 'B', 'W_H', 'G_L')
+ATLAS_DIR = os.path.join(ASSET_DIR, '__atlascache__')
+ATLAS_VERSION = 1  # bump when build_atlas draws differently
+
+
+def import_pygame():
+    global pygame
+    if pygame is None:
+        import pygame as module
+        import pygame.freetype
+        pygame = module
+    return pygame
+
+
+def atlas_path(cell_size):
+    """Return the cache file of the atlas for cell_size and the current sprite files."""
+    digest = hashlib.sha1(f"{ATLAS_VERSION}:{cell_size}".encode())
+    for name in SPRITES.values():
+        with open(os.path.join(ASSET_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return os.path.join(ATLAS_DIR, f"atlas_{cell_size}_{digest.hexdigest()[:16]}.png")
+
+
 class Graphic:
-    def __init__(self, file_path):
-        self.N, self.grid = self.read_input(file_path)
+    def __init__(self, file_path, entailment=False, log_path='output.txt', log_format='text', replay=None):
+        if replay is None:
+            self.N, self.grid = self.read_input(file_path)
+        else:
+            self.N, self.grid = replay.N, replay.grid
         self.cell_size = 60
         self.grid_size = self.N * self.cell_size
         self.sidebar_width = 200 
@@ -11,33 +46,37 @@ class Graphic:
         self.window_height = self.grid_size
         self.screen = None
         self.elements = {}
-        self.agent = Agent()
+        # A Replay stands in for the agent: it has the same position, score and log
+        self.agent = Agent(self.N, entailment, log_path, log_format) if replay is None else replay
         self.agent_position = self.agent.position
         self.start_position = self.agent.position 
         self.action_log = []
+        self.text_cache = {}
+        self.drawn_sidebar = None
 
         # Initialize Pygame
+        import_pygame()
         pygame.init()
         self.screen = pygame.display.set_mode((self.window_width, self.window_height))
         pygame.display.set_caption('Wumpus World')
         self.font = pygame.freetype.SysFont('Arial', 20, bold=True)
         # Load assets
         self.load_assets()
+        self.build_background()
 
-        # Update percepts
-        self.update_percepts()
+        if replay is None:
+            # Update percepts
+            self.update_percepts()
 
-        # Load actions from the output file
-        self.load_actions('output.txt')
+            # Load actions from the output file
+            if log_format == 'text':
+                self.load_actions(log_path)
 
     def read_input(self, file_path):
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-
-        N = int(lines[0].strip())  # First line is the grid size
-        grid = [[cell.split(',') if cell != '-' else [] for cell in line.strip().split('.')] for line in lines[1:]]
-        return N, grid
+        return world.read_level(file_path)
     def load_actions(self, file_path):
+        if not os.path.exists(file_path):
+            return
         with open(file_path, 'r') as f:
             lines = f.readlines()
 
@@ -46,53 +85,54 @@ class Graphic:
         direction_asset = self.elements.get(self.agent.direction, self.elements['RIGHT'])
         agent_x, agent_y = self.agent.position
         self.screen.blit(direction_asset, (agent_y * self.cell_size, agent_x * self.cell_size))
-        self.agent.decide_action()
-    def draw_agent_pause(self):
-        direction_asset = self.elements.get(self.agent.direction, self.elements['RIGHT'])
-        agent_x, agent_y = self.agent.position
-        self.screen.blit(direction_asset, (agent_y * self.cell_size, agent_x * self.cell_size))
 
     def update_agent(self):
         self.agent_position = self.agent.position
 
     def load_assets(self):
-        self.elements['W'] = pygame.image.load('./asset/wumpus.png')
-        self.elements['G'] = pygame.image.load('./asset/gold.png')
-        self.elements['P'] = pygame.image.load('./asset/pit.png')
-        self.elements['P_G'] = pygame.image.load('./asset/gas.png')
-        self.elements['H_P'] = pygame.image.load('./asset/potion.png')
-
-        self.elements['UP'] = pygame.image.load('./asset/agent_up.png')
-        self.elements['DOWN'] = pygame.image.load('./asset/agent_down.png')
-        self.elements['LEFT'] = pygame.image.load('./asset/agent_left.png')
-        self.elements['RIGHT'] = pygame.image.load('./asset/agent_right.png')
-
-        self.elements['S'] = pygame.Surface((self.cell_size // 0.5, self.cell_size // 0.5), pygame.SRCALPHA)
-        self.elements['B'] = pygame.Surface((self.cell_size // 0.5, self.cell_size // 0.5), pygame.SRCALPHA)
-        self.elements['W_H'] = pygame.Surface((self.cell_size // 0.5, self.cell_size // 0.5), pygame.SRCALPHA)
-        self.elements['G_L'] = pygame.Surface((self.cell_size // 0.5, self.cell_size // 0.5), pygame.SRCALPHA)
+        """Cut the element images out of the atlas for this cell size, building it if needed.
+
+        The atlas is one row of cell_size squares, cached as a PNG keyed by the
+        cell size and the sprite file hashes, so a normal start loads one image
+        instead of decoding, drawing and scaling thirteen.
+        """
+        keys = list(SPRITES) + list(OVERLAYS)
+        path = atlas_path(self.cell_size)
+        try:
+            atlas = pygame.image.load(path)
+        except (pygame.error, OSError):
+            atlas = self.build_atlas(keys)
+            try:
+                os.makedirs(ATLAS_DIR, exist_ok=True)
+                pygame.image.save(atlas, path)
+            except (pygame.error, OSError):
+                pass  # read-only asset directory: build it every time
+        atlas = atlas.convert_alpha()
+        for i, key in enumerate(keys):
+            self.elements[key] = atlas.subsurface(pygame.Rect(i * self.cell_size, 0, self.cell_size, self.cell_size))
+
+    def build_atlas(self, keys):
+        elements = {}
+        for key, name in SPRITES.items():
+            elements[key] = pygame.image.load(os.path.join(ASSET_DIR, name))
+
+        for key in OVERLAYS:
+            elements[key] = pygame.Surface((self.cell_size // 0.5, self.cell_size // 0.5), pygame.SRCALPHA)
 
         self.font.size = 20 
-        self.font.render_to(self.elements['S'], (5, 5), 'S', (0, 0, 0))  # Top-left corner
-        self.font.render_to(self.elements['B'], (self.cell_size*1.5 - 5, 0), 'B', (0, 0, 0))  # Top-right corner
-        self.font.render_to(self.elements['W_H'], (5, self.cell_size*1.5 - 5), 'W_H', (0, 0, 0))  # Bottom-left corner
-        self.font.render_to(self.elements['G_L'], (self.cell_size*1.5 - 5, self.cell_size*1.5 - 5), 'G_L', (0, 0, 0))  # Bottom-right corner
-        
-        for key in self.elements:
-            self.elements[key] = pygame.transform.scale(self.elements[key], (self.cell_size, self.cell_size))
+        self.font.render_to(elements['S'], (5, 5), 'S', (0, 0, 0))  # Top-left corner
+        self.font.render_to(elements['B'], (self.cell_size*1.5 - 5, 0), 'B', (0, 0, 0))  # Top-right corner
+        self.font.render_to(elements['W_H'], (5, self.cell_size*1.5 - 5), 'W_H', (0, 0, 0))  # Bottom-left corner
+        self.font.render_to(elements['G_L'], (self.cell_size*1.5 - 5, self.cell_size*1.5 - 5), 'G_L', (0, 0, 0))  # Bottom-right corner
+
+        atlas = pygame.Surface((len(keys) * self.cell_size, self.cell_size), pygame.SRCALPHA)
+        for i, key in enumerate(keys):
+            scaled = pygame.transform.scale(elements[key], (self.cell_size, self.cell_size))
+            atlas.blit(scaled, (i * self.cell_size, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        return atlas
 
     def update_percepts(self):
-        for x in range(self.N):
-            for y in range(self.N):
-                cell_content = self.grid[x][y]
-                if 'W' in cell_content:
-                    self.apply_stench(x, y)
-                if 'P' in cell_content:
-                    self.apply_breeze(x, y)
-                if 'P_G' in cell_content:
-                    self.apply_whiff(x, y)
-                if 'H_P' in cell_content:
-                    self.apply_glow(x, y)
+        self.grid.update_percepts()
 
     def apply_stench(self, x, y):
         self.apply_percept(x, y, 'S')
@@ -107,33 +147,60 @@ class Graphic:
         self.apply_percept(x, y, 'G_L')
 
     def apply_percept(self, x, y, percept):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.N and 0 <= ny < self.N:
-                if percept not in self.grid[nx][ny]:
-                    self.grid[nx][ny].append(percept)
+        self.grid.apply_percept(x, y, percept)
 
-    def draw_grid(self):
+    def build_background(self):
+        """Render the static part of the window once: white fill and cell borders."""
+        self.background = pygame.Surface((self.window_width, self.window_height))
+        self.background.fill((255, 255, 255))
         for x in range(self.N):
             for y in range(self.N):
                 rect = pygame.Rect(y * self.cell_size, x * self.cell_size, self.cell_size, self.cell_size)
-                pygame.draw.rect(self.screen, (0, 0, 0), rect, 1)
-                cell_content = self.grid[x][y]
-                for element in cell_content:
-                    if element in self.elements:
-                        self.screen.blit(self.elements[element], (y * self.cell_size, x * self.cell_size))
-        self.draw_agent()
-    def draw_grid_pause(self):
+                pygame.draw.rect(self.background, (0, 0, 0), rect, 1)
+
+    def draw_cell(self, x, y):
+        """Redraw one cell from the background up and return its screen rect."""
+        rect = pygame.Rect(y * self.cell_size, x * self.cell_size, self.cell_size, self.cell_size)
+        self.screen.blit(self.background, rect, rect)
+        for element in self.grid.cell(x, y):
+            if element in self.elements:
+                self.screen.blit(self.elements[element], rect)
+        if self.agent.position == (x, y):
+            self.draw_agent()
+        return rect
+
+    def draw_grid(self):
+        """Draw every cell and remember what is on screen for draw_dirty_cells."""
+        self.screen.blit(self.background, (0, 0))
         for x in range(self.N):
             for y in range(self.N):
-                rect = pygame.Rect(y * self.cell_size, x * self.cell_size, self.cell_size, self.cell_size)
-                pygame.draw.rect(self.screen, (0, 0, 0), rect, 1)
-                cell_content = self.grid[x][y]
-                for element in cell_content:
-                    if element in self.elements:
-                        self.screen.blit(self.elements[element], (y * self.cell_size, x * self.cell_size))
-        self.draw_agent_pause()
+                self.draw_cell(x, y)
+        self.drawn_grid = self.grid.snapshot()
+        self.drawn_agent = (self.agent.position, self.agent.direction)
+
+    def draw_dirty_cells(self):
+        """Redraw only the cells whose content or agent changed since the last frame."""
+        dirty = set(self.grid.diff(self.drawn_grid))
+        agent_state = (self.agent.position, self.agent.direction)
+        if agent_state != self.drawn_agent:
+            dirty.add(self.drawn_agent[0])
+            dirty.add(self.agent.position)
+            self.drawn_agent = agent_state
+        rects = [self.draw_cell(x, y) for x, y in dirty]
+        if dirty:
+            self.drawn_grid = self.grid.snapshot()
+        return rects
+
+    def text_surface(self, text, size):
+        """Render a line of sidebar text, reusing the surface for repeated text."""
+        key = (text, size)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) > 4096:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = self.font.render(text, (0, 0, 0), size=size)[0]
+        return surface
+
     def display_actions(self):
         log_width = 200
         log_height = self.window_height
@@ -148,8 +215,7 @@ class Graphic:
         scroll_end = log_length 
 
         for i in range(scroll_start, scroll_end):
-            action = action_log[i]
-            self.font.render_to(self.screen, (x_offset + 10, y_offset), action, (0, 0, 0))
+            self.screen.blit(self.text_surface(action_log[i], 20), (x_offset + 10, y_offset))
             y_offset += 25
 
         # Draw a scrollbar if necessary
@@ -162,38 +228,95 @@ class Graphic:
         # Draw the score in the sidebar
         score_text = f"Score: {self.agent.score}"
         hp_text = f"HP: {self.agent.hp}"
-        self.font.size = 30
         score_position = (self.grid_size + 10, 20)
         hp_text_position = (self.grid_size + 10, 50)
         
         self.screen.fill((255, 255, 255), rect=pygame.Rect(self.grid_size, 0, self.sidebar_width, self.window_height))  # Clear the sidebar area
-        self.font.render_to(self.screen, score_position, score_text, (0, 0, 0))
-        self.font.render_to(self.screen, hp_text_position, hp_text, (0, 0, 0))
-    def run_game(self):
+        self.screen.blit(self.text_surface(score_text, 30), score_position)
+        self.screen.blit(self.text_surface(hp_text, 30), hp_text_position)
+
+    def draw_sidebar(self):
+        """Redraw the sidebar if the log or the game state changed; return the dirty rects."""
+        state = (len(self.agent.action_log), self.agent.done)
+        if state == self.drawn_sidebar:
+            return []
+        self.drawn_sidebar = state
+        if self.agent.done:
+            self.display_score()
+        else:
+            self.display_actions()
+        return [pygame.Rect(self.grid_size, 0, self.sidebar_width, self.window_height)]
+
+    def run_game(self, fps=50):
+        """Let the agent play in a worker thread and draw its latest state at fps."""
         running = True
-        flag = True
         clock = pygame.time.Clock()
-        self.agent.graphic = self.grid
-        self.agent.apply_percept(self.agent.graphic[0][0])
-        print(self.agent.graphic[0][0])
+        agent = self.agent
+        agent.graphic = self.grid
+        agent.apply_percept(agent.graphic.cell(0, 0))
+
+        # From here on the worker owns the agent and its grid; draw from a view
+        worker = AgentWorker(agent, self.grid)
+        view = AgentView(agent, self.grid)
+        self.agent, self.grid = view, view.grid
+        self.draw_grid()
+        self.draw_sidebar()
+        pygame.display.flip()
+        worker.start()
 
         while running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+            view.drain(worker.queue)
             self.update_agent()
-            self.screen.fill((255, 255, 255))
-            
-            if(flag):
-                self.draw_grid()
-                self.display_actions()
-            else:
-                self.draw_grid_pause()
-                self.display_actions()
-                self.display_score()
-            if self.agent.position == self.start_position:
-                flag = False
-            pygame.display.flip()
-            clock.tick(50)
+            pygame.display.update(self.draw_dirty_cells() + self.draw_sidebar())
+            clock.tick(fps)
+
+        worker.stop()
+        worker.join()
+        agent.finish()
 
+    def run_replay(self, speed=50, start_step=0):
+        """Play back self.agent, a Replay, at `speed` actions per second.
+
+        Space pauses, Left/Right step back/forward one action, Up/Down double or
+        halve the speed, Page Up/Page Down jump 1000 actions and Home/End jump
+        to the first/last action.
+        """
+        replay = self.agent
+        running = True
+        paused = False
+        pending = 0.0
+        clock = pygame.time.Clock()
+        replay.seek(start_step)
+        self.draw_grid()
+        self.draw_sidebar()
+        pygame.display.flip()
+        jumps = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEUP: -1000, pygame.K_PAGEDOWN: 1000}
 
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key in jumps:
+                        replay.seek(replay.step + jumps[event.key])
+                    elif event.key == pygame.K_HOME:
+                        replay.seek(0)
+                    elif event.key == pygame.K_END:
+                        replay.seek(len(replay.events))
+                    elif event.key == pygame.K_UP:
+                        speed *= 2
+                    elif event.key == pygame.K_DOWN:
+                        speed = max(1, speed // 2)
+            if not paused and not replay.done:
+                pending += speed * clock.get_time() / 1000
+                steps = int(pending)
+                pending -= steps
+                if steps:
+                    replay.seek(replay.step + steps)
+            pygame.display.update(self.draw_dirty_cells() + self.draw_sidebar())
+            clock.tick(60)
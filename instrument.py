@@ -0,0 +1,182 @@
+import cProfile
+import json
+import sys
+import time
+from collections import Counter
+
+DEBUG, INFO, WARNING = 10, 20, 30
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING}
+
+
+class Events:
+    """Leveled event log shared by Agent and KnowledgeBase.
+
+    Call sites test events.debug or events.info before building a message, so
+    with the default WARNING level and no Profiler attached an event costs one
+    attribute lookup. While recording, every event is counted by kind.
+    """
+
+    def __init__(self):
+        self.level = WARNING
+        self.recording = False
+        self.counts = Counter()
+        self.stream = sys.stdout
+        self.debug = False
+        self.info = False
+
+    def configure(self, level=None, recording=None, stream=None):
+        if level is not None:
+            self.level = LEVELS[level] if isinstance(level, str) else level
+        if recording is not None:
+            self.recording = recording
+        if stream is not None:
+            self.stream = stream
+        self.debug = self.recording or self.level <= DEBUG
+        self.info = self.recording or self.level <= INFO
+
+    def emit(self, kind, message, level=DEBUG):
+        if self.recording:
+            self.counts[kind] += 1
+        if level >= self.level:
+            print(message, file=self.stream)
+
+
+events = Events()
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class Profiler:
+    """Count and time the agent's hot calls for one run.
+
+    install() wraps Agent.decide_action, KnowledgeBase.query, apply_logic and
+    solve in timing wrappers, and uninstall() puts the originals back, so an
+    uninstrumented run pays nothing. Every decide_action is one step: its
+    latency is kept, along with the KB size after it. With trace=True each
+    call is also kept as a span for write_trace().
+    """
+
+    TARGETS = (('agent', 'Agent', 'decide_action'),
+               ('knowledgebase', 'KnowledgeBase', 'query'),
+               ('knowledgebase', 'KnowledgeBase', 'apply_logic'),
+               ('knowledgebase', 'KnowledgeBase', 'solve'))
+
+    def __init__(self, trace=False, kb_sample_every=1):
+        self.trace = trace
+        self.kb_sample_every = kb_sample_every
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.step_latency = []
+        self.kb_size = []  # (step, facts, rules)
+        self.spans = []    # (name, start, duration)
+        self.originals = []
+        self.origin = time.perf_counter()
+
+    def install(self):
+        for module_name, class_name, method in self.TARGETS:
+            cls = getattr(__import__(module_name), class_name)
+            original = cls.__dict__[method]
+            self.originals.append((cls, method, original))
+            setattr(cls, method, self.wrap(f"{class_name}.{method}", original))
+        events.counts.clear()
+        events.configure(recording=True)
+        return self
+
+    def uninstall(self):
+        for cls, method, original in reversed(self.originals):
+            setattr(cls, method, original)
+        self.originals = []
+        events.configure(recording=False)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def wrap(self, name, function):
+        profiler = self
+        is_step = name == 'Agent.decide_action'
+
+        def timed(obj, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(obj, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                profiler.calls[name] += 1
+                profiler.seconds[name] += elapsed
+                if profiler.trace:
+                    profiler.spans.append((name, start, elapsed))
+                if is_step:
+                    profiler.step(obj, elapsed)
+
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        return timed
+
+    def step(self, agent, elapsed):
+        self.step_latency.append(elapsed)
+        steps = len(self.step_latency)
+        if steps % self.kb_sample_every == 0:
+            self.kb_size.append((steps, len(agent.kb.facts), agent.kb.rule_count))
+
+    def report(self):
+        """Return the run's profile as a JSON-friendly dict."""
+        latency = self.step_latency
+        return {
+            'steps': len(latency),
+            'step_ms': {
+                'mean': 1000 * sum(latency) / len(latency) if latency else 0.0,
+                'p50': 1000 * percentile(latency, 50),
+                'p99': 1000 * percentile(latency, 99),
+                'max': 1000 * max(latency, default=0.0),
+            },
+            'calls': {name: {'count': self.calls[name], 'seconds': self.seconds[name]} for name in sorted(self.calls)},
+            'kb_size': [{'step': s, 'facts': f, 'rules': r} for s, f, r in self.kb_size],
+            'events': dict(events.counts.most_common()),
+        }
+
+    def format_report(self):
+        report = self.report()
+        step_ms = report['step_ms']
+        lines = [f"Steps: {report['steps']}  step ms: mean {step_ms['mean']:.4f}  p50 {step_ms['p50']:.4f}  "
+                 f"p99 {step_ms['p99']:.4f}  max {step_ms['max']:.4f}"]
+        for name, call in report['calls'].items():
+            lines.append(f"  {name:<28} {call['count']:>9} calls {call['seconds']:>9.4f}s")
+        if self.kb_size:
+            step, facts, rules = self.kb_size[-1]
+            peak = max(f + r for _, f, r in self.kb_size)
+            lines.append(f"KB size: {facts} facts, {rules} rules after step {step} (peak {peak})")
+        lines.append("Events: " + ", ".join(f"{kind}={count}" for kind, count in report['events'].items()))
+        return "\n".join(lines)
+
+    def write_report(self, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_trace(self, file_path):
+        """Write the recorded spans in Chrome trace event format.
+
+        chrome://tracing, Perfetto and speedscope show it as a flame graph.
+        """
+        trace = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                  'ts': 1e6 * (start - self.origin), 'dur': 1e6 * duration}
+                 for name, start, duration in self.spans]
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def run_cprofile(function, file_path, *args, **kwargs):
+    """Call function under cProfile and dump the stats to file_path for pstats or snakeviz."""
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        profile.dump_stats(file_path)
@@ -0,0 +1,162 @@
+import os
+import pickle
+import struct
+import zlib
+from topology import DIRECTIONS
+
+VERSION = 2  # bumped whenever the pickled simulator changes shape
+CHECKPOINT_EVERY = 1000
+CHECKPOINT_SUFFIX = '.ckpt'
+FRAME = struct.Struct('<II')  # payload length, CRC-32 of the payload
+# step, x, y, direction, score, hp, KB facts, KB rules, action log lines, changed cells
+HEAD = struct.Struct('<IHHBiiIIIH')
+CHANGE = struct.Struct('<IH')  # cell index, new mask
+HEAD_FIELDS = ('step', 'x', 'y', 'direction', 'score', 'hp', 'facts', 'rules', 'log_lines')
+
+
+class Journal:
+    """Append-only journal of a Simulator run, with periodic checkpoints.
+
+    Every step appends one framed record of what it changed: the cells whose
+    bits changed, the agent's pose, score and HP, and how many KB facts and
+    rules and log lines there are. Every checkpoint_every steps the whole
+    simulator is pickled to path + '.ckpt' (the KnowledgeBase leaves its
+    solver behind and rebuilds it) and the journal starts again empty, so it
+    never holds more than one checkpoint's worth of steps.
+
+    The records are a replay check, not a redo log: they hold too little to
+    rebuild the KB and beliefs from. resume() loads the checkpoint and runs
+    the agent again over the journaled steps; the agent is deterministic, so
+    this reproduces the lost state, and each replayed step must match its
+    record byte for byte. Each record is flushed as it is written, so a crash
+    loses at most the step in flight, and a torn last record is dropped.
+    """
+
+    def __init__(self, path, checkpoint_every=CHECKPOINT_EVERY):
+        self.path = path
+        self.checkpoint_path = path + CHECKPOINT_SUFFIX
+        self.checkpoint_every = checkpoint_every
+        self.file = None
+        self.shadow = None  # grid masks as of the last record
+
+    def open(self, simulator):
+        """Start journaling simulator; a fresh run is checkpointed first."""
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            self.checkpoint(simulator)
+        self.shadow = simulator.grid.snapshot()
+
+    def record(self, simulator):
+        payload = self.delta(simulator)
+        self.file.write(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.file.flush()
+        if simulator.steps % self.checkpoint_every == 0:
+            self.checkpoint(simulator)
+
+    def delta(self, simulator):
+        """Return the record of simulator's last step and move the shadow grid on."""
+        grid = simulator.grid
+        changed = grid.diff(self.shadow)
+        if changed:
+            self.shadow = grid.snapshot()
+        agent = simulator.agent
+        x, y = agent.position
+        head = HEAD.pack(simulator.steps, x, y, DIRECTIONS.index(agent.direction), agent.score, agent.hp,
+                         len(agent.kb.facts), agent.kb.rule_count, len(agent.action_log), len(changed))
+        return head + b''.join(CHANGE.pack(cx * grid.N + cy, grid.mask(cx, cy)) for cx, cy in changed)
+
+    def checkpoint(self, simulator):
+        """Write simulator to the checkpoint file atomically, then empty the journal."""
+        simulator.lap()  # so a resumed run's elapsed counts the time before the checkpoint
+        temp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': VERSION, 'simulator': simulator}, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        # Records up to here are covered by the checkpoint; resume() skips any left by a crash now
+        self.file.seek(0)
+        self.file.truncate()
+
+    def close(self, simulator):
+        """Checkpoint the finished run, so resuming it again returns at once."""
+        self.checkpoint(simulator)
+        self.file.close()
+        self.file = None
+
+
+def read_records(path):
+    """Return the intact record payloads of a journal and the offset where they end."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    records = []
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(payload)
+        offset += FRAME.size + length
+    return records, offset
+
+
+def decode(payload):
+    """Return a record as a dict, with its cell changes as (cell index, mask) tuples."""
+    fields = HEAD.unpack_from(payload)
+    record = dict(zip(HEAD_FIELDS, fields))
+    record['direction'] = DIRECTIONS[record['direction']]
+    changes = []
+    for k in range(fields[-1]):
+        cell, mask = CHANGE.unpack_from(payload, HEAD.size + k * CHANGE.size)
+        changes.append((cell, mask))
+    record['changes'] = changes
+    return record
+
+
+def has_checkpoint(path):
+    return os.path.exists(path + CHECKPOINT_SUFFIX)
+
+
+def resume(path, checkpoint_every=CHECKPOINT_EVERY):
+    """Return (simulator, journal) restored from path's checkpoint and journal tail.
+
+    The steps after the checkpoint are replayed, not read back from the
+    records, so the simulator is at the last journaled step; pass both to
+    Simulator.run(journal) to carry on. Raises ValueError if a replayed step
+    does not match its record.
+    """
+    with open(path + CHECKPOINT_SUFFIX, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != VERSION:
+        raise ValueError(f"{path}: checkpoint version {state.get('version')}, expected {VERSION}")
+    simulator = state['simulator']
+    records, end = read_records(path)
+    journal = Journal(path, checkpoint_every)
+    journal.shadow = simulator.grid.snapshot()
+    for payload in records:
+        if HEAD.unpack_from(payload)[0] <= simulator.steps:
+            continue
+        simulator.step()
+        if journal.delta(simulator) != payload:
+            raise ValueError(f"{path}: replayed step {simulator.steps} does not match the journal")
+    journal.file = open(path, 'r+b' if os.path.exists(path) else 'wb')
+    journal.file.seek(end)
+    journal.file.truncate()
+    return simulator, journal
+
+
+def run_journaled(path, file_path, checkpoint_every=CHECKPOINT_EVERY, **options):
+    """Play file_path with a journal at path, resuming from it when it has a checkpoint.
+
+    options go to Simulator when the run starts afresh.
+    """
+    from simulator import Simulator
+    if has_checkpoint(path):
+        simulator, journal = resume(path, checkpoint_every)
+    else:
+        simulator, journal = Simulator(file_path, **options), Journal(path, checkpoint_every)
+    return simulator.run(journal)
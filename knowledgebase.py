@@ -1,87 +1,490 @@
+from collections import deque
 from pysat.formula import CNF
 from pysat.solvers import Solver
+from propositions import PropositionPool, PIT, POTION, PERCEPT_OF
+from instrument import events
+
+COMPACT_SLACK = 256  # dead solver clauses tolerated before compact_solver() rebuilds
+# Observations that can stop holding (a percept after a kill, a collected potion):
+# their units are switched by a selector literal instead of added outright
+RETRACTABLE = frozenset(PERCEPT_OF.values()) | {POTION}
+
+
+def wumpus_axioms(pool):
+    """Encode "percept at c <-> some hazard next to c" for every cell as CNF."""
+    clauses = []
+    for x in range(pool.size):
+        for y in range(pool.size):
+            neighbours = pool.neighbours((x, y))
+            for hazard, percept in PERCEPT_OF.items():
+                p = pool.lit(percept, (x, y))
+                hazards = [pool.lit(hazard, n) for n in neighbours]
+                clauses.append([-p] + hazards)
+                clauses.extend([-h, p] for h in hazards)
+    return clauses
+
 
 class KnowledgeBase:
-    def __init__(self):
-        self.facts = set()
-        self.implications = []
-        self.solver = Solver(bootstrap_with=[])
+    """Facts and rules over integer literals from a PropositionPool.
+
+    Rules are indexed by premise and by conclusion, and facts are forward
+    chained to a fixpoint as soon as they arrive, so self.facts always holds
+    every asserted and derived literal. With entailment=True the solver is
+    loaded with the Wumpus-world axioms and query() proves literals by
+    refutation instead of looking them up.
+
+    checkpoint() and rollback() let a planner try hypothetical percepts: while
+    a checkpoint is open every change is logged on an undo trail, and solver
+    clauses are guarded by an activation literal that rollback() switches off,
+    so reverting costs as much as the changes did. Observations that can stop
+    holding are switched the same way, by a selector literal assumed on every
+    solve, so retracting one rebuilds nothing.
+
+    Rules are deduplicated on insert, and asserting a literal settles it:
+    rules concluding it or its negation are dropped and the opposite
+    literal stops being a fact. With the solver compacted once enough of
+    its clauses are dead, the KB stays bounded by the grid size however
+    long the game runs.
+    """
+
+    def __init__(self, grid_size=10, entailment=False):
+        self.pool = PropositionPool(grid_size)
+        self.facts = set()      # asserted and derived
+        self.asserted = set()
+        self.by_premise = {}    # premise -> [conclusion, ...]
+        self.by_conclusion = {} # conclusion -> [premise, ...]
+        self.rule_count = 0
+        self.agenda = deque()
+        self.entailment = entailment
+        self.axioms = wumpus_axioms(self.pool) if entailment else []
+        self.units = {}    # var -> observed literal, kept so the solver can be rebuilt
+        self.selectors = {}  # var -> selector literal of a RETRACTABLE unit
+        self.clauses = []  # clauses added through add_to_cnf
+        self.clause_keys = set()
+        self.trail = []    # undo records of the open checkpoints
+        self.marks = []    # per open checkpoint: [trail length, activation literals, solver epoch]
+        self.activation = self.pool.top  # last variable used as an activation or selector literal
+        self.epoch = 0     # bumped whenever the solver is rebuilt
+        self.solver = None
+        self.reset_solver()
+
+    def __getstate__(self):
+        # The solver cannot be pickled, and the axioms follow from the grid size;
+        # both are rebuilt from the pool, units and clauses
+        state = self.__dict__.copy()
+        state['solver'] = None
+        state['axioms'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.axioms = wumpus_axioms(self.pool) if self.entailment else []
+        self.reset_solver()
+
+    @property
+    def implications(self):
+        return [(p, c) for p, conclusions in self.by_premise.items() for c in conclusions]
 
     def add_fact(self, fact):
         """Add a fact to the knowledge base."""
-        self.facts.add(fact)
-        print(f"Fact added: {fact}")
+        if -fact in self.asserted:
+            self.remove_fact(-fact)  # the newer observation wins
+        self.settle(fact)
+        if fact not in self.asserted:
+            self.asserted.add(fact)
+            if self.marks:
+                self.trail.append(('assert', fact))
+        if fact not in self.facts:
+            self.facts.add(fact)
+            if self.marks:
+                self.trail.append(('fact', fact))
+            self.agenda.append(fact)
+            self.apply_logic()
+        if self.entailment:
+            self.add_unit(fact)
+        if events.debug:
+            events.emit('fact_added', f"Fact added: {self.pool.describe(fact)}")
 
     def remove_fact(self, fact):
-        """Remove a fact from the knowledge base."""
-        if fact in self.facts:
-            self.facts.remove(fact)
-            print(f"Fact removed: {fact}")
+        """Remove a fact from the knowledge base.
+
+        Only the assertion is withdrawn: a fact that rules still derive stays.
+        """
+        if fact in self.asserted:
+            self.asserted.remove(fact)
+            if self.marks:
+                self.trail.append(('unassert', fact))
+            self.retract_derived([fact])
+            if self.entailment:
+                self.retract([fact])
+            if events.debug:
+                events.emit('fact_removed', f"Fact removed: {self.pool.describe(fact)}")
 
     def add_implication(self, premise, conclusion):
-        """Add an implication (rule) to the knowledge base."""
-        self.implications.append((premise, conclusion))
-        print(f"Rule added: {premise} -> {conclusion}")
+        """Add an implication (rule) to the knowledge base, unless it is known or settled."""
+        conclusions = self.by_premise.get(premise)
+        if conclusions is not None and conclusion in conclusions:
+            return
+        if conclusion in self.asserted or -conclusion in self.asserted:
+            return
+        self.by_premise.setdefault(premise, []).append(conclusion)
+        self.by_conclusion.setdefault(conclusion, []).append(premise)
+        self.rule_count += 1
+        if self.marks:
+            self.trail.append(('rule', premise, conclusion))
+        if premise in self.facts and conclusion not in self.facts:
+            self.facts.add(conclusion)
+            if self.marks:
+                self.trail.append(('fact', conclusion))
+            self.agenda.append(conclusion)
+            self.apply_logic()
+        if events.debug:
+            events.emit('rule_added', f"Rule added: {self.pool.describe(premise)} -> {self.pool.describe(conclusion)}")
 
     def query(self, fact):
         """Query whether a fact is true based on the current knowledge."""
-        # Check if the fact is explicitly known
-        if fact in self.facts:
-            return True
-        
-        # Check if the fact can be inferred using implications
-        for premise, conclusion in self.implications:
-            if premise in self.facts and conclusion == fact:
-                return True
-        
-        return False
+        if self.entailment:
+            # Rule conclusions are guesses, so only assertions short-cut the solver
+            return fact in self.asserted or self.entails(fact)
+        return fact in self.facts
 
     def apply_logic(self):
-        """Apply logic to derive new facts based on the implications."""
+        """Fire the rules of every fact on the agenda until nothing new is derived."""
         new_facts = set()
-        for premise, conclusion in self.implications:
-            if premise in self.facts and conclusion not in self.facts:
-                new_facts.add(conclusion)
-        
-        # Add all derived facts to the knowledge base
-        self.facts.update(new_facts)
+        while self.agenda:
+            fact = self.agenda.popleft()
+            for conclusion in self.by_premise.get(fact, ()):
+                if conclusion not in self.facts:
+                    self.facts.add(conclusion)
+                    if self.marks:
+                        self.trail.append(('fact', conclusion))
+                    new_facts.add(conclusion)
+                    self.agenda.append(conclusion)
         return new_facts
 
+    def is_supported(self, fact):
+        """Return True if fact is asserted or follows from a rule whose premise holds."""
+        if fact in self.asserted:
+            return True
+        return any(p in self.facts for p in self.by_conclusion.get(fact, ()))
+
+    def retract_derived(self, lost):
+        """Withdraw facts that lost their support, then rederive what still follows.
+
+        Everything reachable from the lost facts through the rules is dropped
+        first, and the dropped facts that still have another supported premise
+        are put back on the agenda, so cycles in the rules cannot keep each
+        other alive and the work is bounded by the affected facts.
+        """
+        dropped = []
+        stack = [fact for fact in lost if fact in self.facts]
+        for fact in stack:
+            self.facts.discard(fact)
+        while stack:
+            fact = stack.pop()
+            dropped.append(fact)
+            for conclusion in self.by_premise.get(fact, ()):
+                if conclusion in self.facts and conclusion not in self.asserted:
+                    self.facts.discard(conclusion)
+                    stack.append(conclusion)
+        for fact in dropped:
+            if fact not in self.facts and self.is_supported(fact):
+                self.facts.add(fact)
+                self.agenda.append(fact)
+            elif self.marks:
+                self.trail.append(('unfact', fact))
+        self.apply_logic()
+
     def add_to_cnf(self, clause):
-        """Add a clause to the CNF formula and to the SAT solver."""
+        """Add a clause of pool literals to the CNF formula and to the SAT solver."""
+        key = tuple(sorted(set(clause)))
+        if key in self.clause_keys:
+            return
         cnf = CNF()
-        cnf.append(clause)
+        cnf.append(self.guard(clause))
+        self.clauses.append(list(clause))
+        self.clause_keys.add(key)
+        if self.marks:
+            self.trail.append(('clause',))
         self.solver.append_formula(cnf)
+        self.solver_clauses += 1
+        self.version += 1
+        self.compact_solver()
+
+    def add_unit(self, lit):
+        """Tell the solver that a literal holds, unless it is already known."""
+        previous = self.units.get(abs(lit))
+        if previous == lit:
+            return
+        var = abs(lit)
+        if self.marks:
+            self.trail.append(('unit', var, previous, self.selectors.get(var)))
+        self.units[var] = lit
+        if self.pool.decode(lit)[0] in RETRACTABLE:
+            # A fresh selector; the previous one, if any, is no longer assumed
+            self.activation += 1
+            self.selectors[var] = self.activation
+            self.solver.add_clause(self.guard([lit, -self.activation]))
+            if previous is not None:
+                self.proved = set()
+        elif previous is not None:
+            # The solver still holds the opposite unit
+            self.reset_solver()
+            return
+        else:
+            self.solver.add_clause(self.guard([lit]))
+        self.solver_clauses += 1
+        self.version += 1
+        self.compact_solver()
+
+    def observe(self, position, percepts):
+        """Record which percepts were (and were not) sensed at a visited cell.
+
+        The agent never enters a pit, so the cell itself is also pit free.
+        """
+        if not self.entailment:
+            return
+        for percept in PERCEPT_OF.values():
+            lit = self.pool.lit(percept, position)
+            self.add_unit(lit if percept in percepts else -lit)
+        self.add_unit(-self.pool.lit(PIT, position))
+
+    def retract(self, lits):
+        """Forget observations that no longer hold, e.g. stench after a kill."""
+        removed = [abs(lit) for lit in lits if abs(lit) in self.units]
+        rebuild = False
+        for var in removed:
+            if self.marks:
+                self.trail.append(('unit', var, self.units[var], self.selectors.get(var)))
+            del self.units[var]
+            if self.selectors.pop(var, None) is None:
+                rebuild = True
+        if rebuild:
+            self.reset_solver()
+        elif removed:
+            # Dropping a selector weakens the KB, so earlier proofs may not hold
+            self.proved = set()
+            self.version += 1
+
+    def reset_solver(self):
+        """Rebuild the solver from the axioms and the current observations."""
+        if self.solver is not None:
+            self.solver.delete()
+        self.solver = Solver(bootstrap_with=self.axioms)
+        self.epoch += 1
+        self.solver_clauses = len(self.clauses) + len(self.units)
+        for clause in self.clauses:
+            self.solver.add_clause(clause)
+        for var, lit in self.units.items():
+            selector = self.selectors.get(var)
+            self.solver.add_clause([lit] if selector is None else [lit, -selector])
+        self.version = 0
+        self.proved = set()
+        self.refuted = {}  # lit -> version at which it was last shown not entailed
+        self.model = None
+        self.model_version = -1
+
+    def entails(self, lit):
+        """Return True if the clauses entail lit, i.e. the KB with not lit is unsatisfiable.
+
+        A proved literal stays proved while clauses are only added, and a refuted
+        one is only checked again once new clauses have arrived. The model found
+        for the last refutation also refutes every other literal it makes false.
+        """
+        if lit in self.proved:
+            return True
+        if self.refuted.get(lit) == self.version:
+            return False
+        if self.model_version == self.version and abs(lit) <= len(self.model) and self.model[abs(lit) - 1] == -lit:
+            self.refuted[lit] = self.version
+            return False
+        if not self.solve([-lit]):
+            self.proved.add(lit)
+            if self.marks:
+                self.trail.append(('proved', lit))
+            return True
+        self.model = self.solver.get_model()
+        self.model_version = self.version
+        self.refuted[lit] = self.version
+        return False
 
     def check_sat(self, assumptions):
         """Check if the assumptions are satisfiable using the SAT solver."""
-        return self.solver.solve(assumptions)
+        return self.solve(assumptions)
+
+    def solve(self, assumptions):
+        """Run the SAT solver under assumptions; every solver call goes through here."""
+        if self.marks or self.selectors:
+            assumptions = ([a for mark in self.marks for a in mark[1]] + list(self.selectors.values())
+                           + list(assumptions))
+        return self.solver.solve(assumptions=assumptions)
+
+    def guard(self, clause):
+        """Return clause as the solver should get it: switched by the innermost
+        checkpoint's activation literal while one is open."""
+        if not self.marks:
+            return clause
+        return list(clause) + [-self.marks[-1][1][0]]
+
+    def checkpoint(self):
+        """Open a checkpoint that rollback() returns to; checkpoints nest."""
+        self.activation += 1
+        self.marks.append([len(self.trail), [self.activation], self.epoch])
+        return len(self.marks)
+
+    def commit(self):
+        """Close the innermost checkpoint and keep its changes.
+
+        Inside another checkpoint the changes join the outer one, so rolling
+        that back still reverts them.
+        """
+        start, activations, epoch = self.marks.pop()
+        if self.marks:
+            self.marks[-1][1].extend(activations)
+            return
+        self.trail.clear()
+        # Even after a rebuild inside the checkpoint, later clauses are guarded
+        # by these activations, which solve() stops assuming from here on
+        for a in activations:
+            self.solver.add_clause([a])
+
+    def rollback(self):
+        """Undo every change since the innermost checkpoint and close it."""
+        start, activations, epoch = self.marks.pop()
+        trail = self.trail
+        while len(trail) > start:
+            record = trail.pop()
+            kind = record[0]
+            if kind == 'fact':
+                self.facts.discard(record[1])
+            elif kind == 'unfact':
+                self.facts.add(record[1])
+            elif kind == 'assert':
+                self.asserted.discard(record[1])
+            elif kind == 'unassert':
+                self.asserted.add(record[1])
+            elif kind == 'rule':
+                self.unlink(self.by_premise, record[1])
+                self.unlink(self.by_conclusion, record[2])
+                self.rule_count -= 1
+            elif kind == 'rules':
+                _, key, conclusions, premises, rule_count = record
+                self.relink(self.by_premise, key, conclusions)
+                self.relink(self.by_conclusion, key, premises)
+                self.rule_count = rule_count
+            elif kind == 'premises':
+                self.relink(self.by_premise, record[1], record[2])
+            elif kind == 'conclusions':
+                self.relink(self.by_conclusion, record[1], record[2])
+            elif kind == 'unit':
+                _, var, lit, selector = record
+                self.relink(self.units, var, lit)
+                self.relink(self.selectors, var, selector)
+            elif kind == 'clause':
+                self.clause_keys.discard(tuple(sorted(set(self.clauses.pop()))))
+            elif kind == 'count':
+                self.rule_count = record[1]
+            elif kind == 'proved':
+                self.proved.discard(record[1])
+        if self.epoch != epoch:
+            # The solver was rebuilt with this checkpoint's clauses unguarded
+            self.reset_solver()
+        else:
+            for a in activations:
+                self.solver.add_clause([-a])
+            self.version += 1
+            self.compact_solver()
+
+    def compact_solver(self):
+        """Rebuild the solver once most of its clauses are overridden or rolled back."""
+        live = len(self.clauses) + len(self.units)
+        if not self.marks and self.solver_clauses > 2 * live + COMPACT_SLACK:
+            self.reset_solver()
+
+    def unlink(self, index, key):
+        items = index[key]
+        items.pop()
+        if not items:
+            del index[key]
+
+    def relink(self, index, key, items):
+        if items is None:
+            index.pop(key, None)
+        else:
+            index[key] = items
 
     def explain(self, fact):
         """Explain why a fact is true, if it is."""
-        if fact in self.facts:
-            return f"{fact} is known as a fact."
-        for premise, conclusion in self.implications:
-            if conclusion == fact and premise in self.facts:
-                return f"{fact} is inferred from {premise}."
-        return f"No explanation for {fact}."
+        text = self.pool.describe(fact)
+        if fact in self.asserted:
+            return f"{text} is known as a fact."
+        for premise in self.by_conclusion.get(fact, ()):
+            if premise in self.facts:
+                return f"{text} is inferred from {self.pool.describe(premise)}."
+        return f"No explanation for {text}."
 
     def update_knowledge(self, fact, is_present):
         """Update knowledge based on new information about a fact's presence."""
         if not is_present:
             # If the fact is not present, remove any implications related to it
             self.remove_fact(fact)
-            # Assuming 'fact' is in the form 'Wumpus at (x,y)'
-            negated_fact = f"not {fact}"
+            negated_fact = -fact
             self.add_fact(negated_fact)  # Mark the fact as not present
             self.remove_related_implications(fact)
         else:
             self.add_fact(fact)
         self.apply_logic()
 
+    def settle(self, fact):
+        """Drop the rules that conclude fact or its negation, which is now known,
+        and withdraw the negation if only such rules derived it."""
+        for lit in (fact, -fact):
+            premises = self.by_conclusion.pop(lit, None)
+            if premises is None:
+                continue
+            if self.marks:
+                self.trail.append(('count', self.rule_count))
+                self.trail.append(('conclusions', lit, premises))
+            for premise in set(premises):
+                conclusions = self.by_premise[premise]
+                if self.marks:
+                    self.trail.append(('premises', premise, conclusions))
+                kept = [c for c in conclusions if c != lit]
+                self.rule_count -= len(conclusions) - len(kept)
+                if kept:
+                    self.by_premise[premise] = kept
+                else:
+                    del self.by_premise[premise]
+        if -fact in self.facts:
+            self.retract_derived([-fact])
+
     def remove_related_implications(self, fact):
         """Remove implications related to a fact."""
-        self.implications = [(p, c) for p, c in self.implications if p != fact and c != fact]
-        print(f"Removed implications related to {fact}")
+        if self.marks:
+            conclusions, premises = self.by_premise.get(fact), self.by_conclusion.get(fact)
+            self.trail.append(('rules', fact, None if conclusions is None else list(conclusions),
+                               None if premises is None else list(premises), self.rule_count))
+        conclusions = self.by_premise.pop(fact, [])
+        self.rule_count -= len(conclusions)
+        for conclusion in conclusions:
+            if self.marks:
+                self.trail.append(('conclusions', conclusion, list(self.by_conclusion[conclusion])))
+            self.by_conclusion[conclusion].remove(fact)
+            if not self.by_conclusion[conclusion]:
+                del self.by_conclusion[conclusion]
+        for premise in self.by_conclusion.pop(fact, []):
+            if premise in self.by_premise:
+                if self.marks:
+                    self.trail.append(('premises', premise, self.by_premise[premise]))
+                kept = [c for c in self.by_premise[premise] if c != fact]
+                self.rule_count -= len(self.by_premise[premise]) - len(kept)
+                if kept:
+                    self.by_premise[premise] = kept
+                else:
+                    del self.by_premise[premise]
+        lost = conclusions + [fact] if fact in self.facts else conclusions
+        self.retract_derived([c for c in lost if c in self.facts])
+        if events.debug:
+            events.emit('rules_removed', f"Removed implications related to {self.pool.describe(fact)}")
 
 
@@ -0,0 +1,60 @@
+import argparse
+import random
+
+# Fraction of cells holding each element; a cell holds at most one of them
+DENSITIES = {'W': 0.03, 'P': 0.08, 'P_G': 0.03, 'H_P': 0.02, 'G': 0.02}
+
+
+def generate_level(N, seed=None, densities=None):
+    """Return an N x N grid of element lists, drawn with a seeded RNG.
+
+    The start cell (0, 0) is always left empty.
+    """
+    densities = DENSITIES if densities is None else densities
+    if sum(densities.values()) > 1:
+        raise ValueError("Element densities must add up to at most 1")
+    rng = random.Random(seed)
+    thresholds = []
+    total = 0.0
+    for element, density in densities.items():
+        total += density
+        thresholds.append((total, element))
+
+    grid = []
+    for x in range(N):
+        row = []
+        for y in range(N):
+            r = rng.random()
+            element = next((e for limit, e in thresholds if r < limit), None)
+            row.append([element] if element and (x, y) != (0, 0) else [])
+        grid.append(row)
+    return grid
+
+
+def format_level(grid):
+    """Return a grid in the level file format read by world.read_level."""
+    lines = [str(len(grid))]
+    for row in grid:
+        lines.append('.'.join(','.join(cell) if cell else '-' for cell in row))
+    return "\n".join(lines) + "\n"
+
+
+def write_level(file_path, N, seed=None, densities=None):
+    with open(file_path, 'w') as f:
+        f.write(format_level(generate_level(N, seed, densities)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a random Wumpus World level')
+    parser.add_argument('N', type=int, help='grid size')
+    parser.add_argument('file_path', help='where to write the level')
+    parser.add_argument('--seed', type=int, default=None)
+    for element, name in (('W', 'wumpus'), ('P', 'pit'), ('P_G', 'gas'), ('H_P', 'potion'), ('G', 'gold')):
+        parser.add_argument(f'--{name}', type=float, default=DENSITIES[element], help=f'{name} density')
+    args = parser.parse_args()
+
+    densities = {'W': args.wumpus, 'P': args.pit, 'P_G': args.gas, 'H_P': args.potion, 'G': args.gold}
+    write_level(args.file_path, args.N, args.seed, densities)
+
+if __name__ == "__main__":
+    main()
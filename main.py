@@ -1,10 +1,77 @@
-from graphic import Graphic
+import argparse
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Wumpus World')
+    parser.add_argument('file_path', nargs='?', default='./asset/input/level1.txt',
+                        help='level file to play, or a directory or glob of levels with --batch')
+    parser.add_argument('--headless', action='store_true', help='run the agent without a window and print the result')
+    parser.add_argument('--batch', action='store_true', help='play many levels headless in a process pool')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for --batch (default: CPU count)')
+    parser.add_argument('--output-dir', default='batch_output', help='where --batch writes logs and summary.csv')
+    parser.add_argument('--entailment', action='store_true', help='answer KB queries with the SAT solver')
+    parser.add_argument('--log-format', choices=['text', 'jsonl'], default='text', help='format of the action log')
+    parser.add_argument('--output', default='output.txt', help='where to write the action log')
+    parser.add_argument('--replay', metavar='TRACE', help='play back a recorded action log on the level')
+    parser.add_argument('--seek', type=int, default=0, help='action to start the replay from')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning'], default='warning',
+                        help='debug narrates every fact, rule and move')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='REPORT',
+                        help='with --headless, print a step latency and KB size profile (and save it as JSON)')
+    parser.add_argument('--trace', metavar='FILE', help='with --headless, write a Chrome trace of the profiled calls')
+    parser.add_argument('--cprofile', metavar='FILE', help='with --headless, dump cProfile stats of the run')
+    parser.add_argument('--journal', metavar='FILE',
+                        help='with --headless, journal the run to FILE and resume it from there if it was cut short '
+                             '(the steps since the last checkpoint are replayed and checked against the journal)')
+    parser.add_argument('--resumable', action='store_true',
+                        help='with --batch, journal each level next to its log and resume cut short levels')
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help='with --journal, steps between checkpoints')
+    args = parser.parse_args()
+
+    from instrument import events
+    events.configure(level=args.log_level)
 
-    file_path = './asset/input/level1.txt' 
-    wumpus_world = Graphic(file_path)
-    wumpus_world.run_game()
+    if args.replay:
+        from graphic import Graphic
+        from replay import Replay
+        Graphic(args.file_path, replay=Replay(args.file_path, args.replay)).run_replay(start_step=args.seek)
+    elif args.batch:
+        from batch import find_levels, run_batch, format_table
+        rows = run_batch(find_levels(args.file_path), args.output_dir, args.workers, args.entailment, args.log_format,
+                         args.resumable)
+        print(format_table(rows))
+    elif args.headless:
+        from instrument import Profiler, run_cprofile
+        from simulator import Simulator
+        from journal import Journal, has_checkpoint, resume
+        if args.journal and has_checkpoint(args.journal):
+            simulator, journal = resume(args.journal, args.checkpoint_every)
+            print(f"Resumed at step {simulator.steps}")
+        else:
+            simulator = Simulator(args.file_path, entailment=args.entailment, log_path=args.output,
+                                  log_format=args.log_format)
+            journal = Journal(args.journal, args.checkpoint_every) if args.journal else None
+        profiler = None
+        if args.profile or args.trace:
+            profiler = Profiler(trace=args.trace is not None).install()
+        if args.cprofile:
+            result = run_cprofile(simulator.run, args.cprofile, journal)
+        else:
+            result = simulator.run(journal)
+        print(f"Score: {result.score}")
+        print(f"Hp: {result.hp}")
+        print(f"Steps: {result.steps} ({result.outcome}, {result.elapsed:.3f}s)")
+        if profiler:
+            profiler.uninstall()
+            print(profiler.format_report())
+            if args.profile and args.profile != '-':
+                profiler.write_report(args.profile)
+            if args.trace:
+                profiler.write_trace(args.trace)
+    else:
+        from graphic import Graphic
+        wumpus_world = Graphic(args.file_path, args.entailment, args.output, args.log_format)
+        wumpus_world.run_game()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
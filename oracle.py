@@ -0,0 +1,317 @@
+import argparse
+import heapq
+from array import array
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from topology import DIRECTIONS
+import topology
+import world
+
+GOLD_REWARD = 5000
+TURN_COST = 10
+SHOT_COST = 100
+POTION_COST = 10
+WUMPUS_COST = 10000
+HP_STEPS = 4        # HP is kept in units of 25, from 0 to 100
+STATE_BYTES = 120   # rough size of one settled-table entry, for the memory limit
+OPEN_BYTES = 230    # rough size of one cost-table entry with its heap entry
+UNREACHED = 1 << 30
+COLUMNS = ('level', 'optimal', 'exact', 'agent', 'percent', 'states', 'time')
+
+
+class Oracle:
+    """Best achievable score on a level, knowing everything about it.
+
+    The rules are Agent's: +5000 for gold, -10 per turn, -100 per shot, -10
+    and +25 HP (up to 100) for a potion and -25 HP in gas; pits cannot be
+    entered. The game ends by climbing out at the start or by dying in gas,
+    keeping the score so far. Walking onto a live wumpus (-10000) is never
+    better than shooting it first (-100), so a wumpus is shot on the way in.
+
+    The search runs over the cells where something happens (the start, gold,
+    potions, gas and wumpuses); routes between them cross plain cells and are
+    charged their turns. It is A* over (cell, direction, HP, collected
+    items, killed wumpuses) packed into one int. Edge costs are the penalties,
+    and the final edge into the end state costs 5000 per gold left behind, so
+    costs are non-negative and the cheapest path to the end gives the best
+    score. The heuristic is the dearest single gold left: fetching it and
+    then ending, or leaving it, counting only the turns round the pits. It
+    never overestimates and is consistent, so A* still finds the optimum. A state is skipped
+    when one with the same cell, direction, HP and potions and at least its
+    gold and kills was settled no more expensively. If the settled and open
+    states would outgrow memory_mb, solve() stops and returns the score of
+    collecting all reachable gold for free, an upper bound, with exact=False.
+    The states it reports are the settled ones.
+    """
+
+    def __init__(self, file_path, memory_mb=512):
+        self.N, self.grid = world.read_level(file_path)
+        self.memory = memory_mb * 1024 * 1024
+        N = self.N
+        cells = N * N
+        # (cell * 4 + direction) -> cell ahead, or -1 at a wall or pit
+        self.front = [-1 if ahead < 0 or self.grid.test(*divmod(ahead, N), 'P') else ahead
+                      for ahead in topology.grid(N).step]
+
+        reachable = self.reachable()
+        self.gold = {}    # cell -> item bit
+        self.potion = {}
+        self.wumpus = {}  # cell -> killed bit
+        items = 0
+        for cell in sorted(reachable):
+            x, y = divmod(cell, N)
+            if self.grid.test(x, y, 'G') or self.grid.test(x, y, 'H_P'):
+                table = self.gold if self.grid.test(x, y, 'G') else self.potion
+                table[cell] = 1 << items
+                items += 1
+            if self.grid.test(x, y, 'W'):
+                self.wumpus[cell] = 1 << len(self.wumpus)
+        self.gas = {cell for cell in reachable if self.grid.test(*divmod(cell, N), 'P_G')}
+        self.gold_mask = sum(self.gold.values())
+        self.stops = {0} | set(self.gold) | set(self.potion) | set(self.wumpus) | self.gas
+        self.routes = {}  # cell * 4 + direction -> [(cost, stop, arrival direction), ...]
+        # Turns from every (cell, direction) to where the game can end, and to each gold
+        self.end_turns = self.turns({0} | self.gas)
+        self.gold_turns = [(bit, self.turns({cell}), min(self.end_turns[cell * 4:cell * 4 + 4]))
+                           for cell, bit in self.gold.items()]
+        self.gold_order = {}  # cell * 4 + direction -> ((bound, gold bit), ...), dearest first
+
+        # Bit layout: cell | direction | hp | items | killed
+        self.cell_bits = max(1, (cells - 1).bit_length())
+        self.dir_shift = self.cell_bits
+        self.hp_shift = self.dir_shift + 2
+        self.item_shift = self.hp_shift + 3
+        self.kill_shift = self.item_shift + items
+
+    def reachable(self):
+        """Return the cells reachable from the start without entering a pit."""
+        seen = {0}
+        queue = deque([0])
+        while queue:
+            cell = queue.popleft()
+            for direction in range(4):
+                ahead = self.front[cell * 4 + direction]
+                if ahead >= 0 and ahead not in seen:
+                    seen.add(ahead)
+                    queue.append(ahead)
+        return seen
+
+    def route(self, cell, direction):
+        """Return the cheapest ways to step forward from (cell, direction) to
+        each (stop, arrival direction) across plain cells only.
+
+        An arrival is dropped when arriving facing another way and turning
+        there is no dearer. Each route comes with what its stop holds:
+        (cost, packed stop and direction, wumpus bit, gas, potion bit, gold bit).
+        """
+        key = cell * 4 + direction
+        if key in self.routes:
+            return self.routes[key]
+        found = []
+        ahead = self.front[key]
+        if ahead >= 0:
+            # 0-1 BFS over cell * 4 + direction: stepping forward is free, a turn costs TURN_COST
+            start = ahead * 4 + direction
+            costs = {start: 0}
+            done = set()
+            queue = deque([start])
+            while queue:
+                pose = queue.popleft()
+                if pose in done:
+                    continue
+                done.add(pose)
+                cost = costs[pose]
+                here = pose >> 2
+                if here in self.stops:
+                    found.append((cost, here, pose & 3))
+                    continue
+                step = self.front[pose]
+                if step >= 0:
+                    new_pose = step * 4 + (pose & 3)
+                    if cost < costs.get(new_pose, cost + 1):
+                        costs[new_pose] = cost
+                        queue.appendleft(new_pose)
+                new_cost = cost + TURN_COST
+                for new_pose in (pose & ~3 | (pose + 1) & 3, pose & ~3 | (pose - 1) & 3):
+                    if new_cost < costs.get(new_pose, new_cost + 1):
+                        costs[new_pose] = new_cost
+                        queue.append(new_pose)
+        best = {(stop, facing): cost for cost, stop, facing in found}
+        routes = []
+        for cost, stop, facing in found:
+            if any(self.turned_cost(best, stop, facing, turns) <= cost for turns in (1, 2, 3)):
+                continue
+            routes.append((cost, stop | facing << self.dir_shift, self.wumpus.get(stop, 0), stop in self.gas,
+                           self.potion.get(stop, 0), self.gold.get(stop, 0)))
+        self.routes[key] = routes
+        return routes
+
+    def turns(self, targets):
+        """Return the turn cost from every (cell, direction) to the nearest target cell,
+        going round pits but through everything else; UNREACHED where there is none."""
+        costs = array('i', [UNREACHED]) * len(self.front)
+        done = bytearray(len(self.front))
+        queue = deque()
+        for cell in targets:
+            for direction in range(4):
+                costs[cell * 4 + direction] = 0
+                queue.append(cell * 4 + direction)
+        while queue:
+            pose = queue.popleft()
+            if done[pose]:
+                continue
+            done[pose] = 1
+            cost = costs[pose]
+            # Moves are undone by turning round, so walk backwards from the targets
+            back = self.front[pose ^ 2]
+            if back >= 0:
+                previous = back * 4 + (pose & 3)
+                if cost < costs[previous]:
+                    costs[previous] = cost
+                    queue.appendleft(previous)
+            new_cost = cost + TURN_COST
+            for previous in (pose & ~3 | (pose + 1) & 3, pose & ~3 | (pose - 1) & 3):
+                if new_cost < costs[previous]:
+                    costs[previous] = new_cost
+                    queue.append(previous)
+        return costs
+
+    def heuristic(self, state):
+        """Return a lower bound on the cost from state to the end."""
+        pose = (state & ((1 << self.cell_bits) - 1)) * 4 + (state >> self.dir_shift & 3)
+        items = state >> self.item_shift
+        end = self.end_turns[pose]
+        order = self.gold_order.get(pose)
+        if order is None:
+            # Searched states only stand on stops, so few poses ever get here
+            order = tuple(sorted(((min(GOLD_REWARD + end, turns[pose] + then_end), bit)
+                                  for bit, turns, then_end in self.gold_turns), reverse=True))
+            self.gold_order[pose] = order
+        for bound, bit in order:
+            if not items & bit:
+                return max(end, bound)
+        return end
+
+    def turned_cost(self, best, stop, facing, turns):
+        """Cost of arriving at stop facing another way, then turning to face facing."""
+        other = best.get((stop, (facing + turns) % 4))
+        if other is None:
+            return float('inf')
+        return other + TURN_COST * min(turns, 4 - turns)
+
+    def pack(self, cell, direction, hp, items, killed):
+        return (cell | direction << self.dir_shift | hp << self.hp_shift
+                | items << self.item_shift | killed << self.kill_shift)
+
+    def unpack(self, state):
+        cell = state & ((1 << self.cell_bits) - 1)
+        direction = (state >> self.dir_shift) & 3
+        hp = (state >> self.hp_shift) & 7
+        items = (state >> self.item_shift) & ((1 << (self.kill_shift - self.item_shift)) - 1)
+        killed = state >> self.kill_shift
+        return cell, direction, hp, items, killed
+
+    def upper_bound(self):
+        return GOLD_REWARD * len(self.gold)
+
+    def solve(self):
+        """Return (best score, exact, states settled)."""
+        start_items = self.gold.get(0, 0)  # gold on the start cell is picked up at once
+        start = self.pack(0, DIRECTIONS.index('RIGHT'), HP_STEPS, start_items, 0)
+        end = -1
+        costs = {start: 0}
+        heap = [(self.heuristic(start), 0, start)]  # (cost + heuristic, -cost, state): deeper states first on ties
+        settled = {}  # state without gold and kills -> [(gold and kills, cost), ...] settled so far
+        count = 0
+        gains_mask = self.gold_mask << self.item_shift | ~((1 << self.kill_shift) - 1)
+        while heap:
+            _, cost, state = heapq.heappop(heap)
+            cost = -cost
+            if state == end:
+                return self.upper_bound() - cost, True, count
+            if cost > costs[state]:
+                continue
+            gains = state & gains_mask
+            others = settled.setdefault(state & ~gains_mask, [])
+            # A* settles in order of cost plus heuristic, so the costs are compared too
+            if any(gains & other == gains and other_cost <= cost for other, other_cost in others):
+                continue
+            others.append((gains, cost))
+            count += 1
+            if count * STATE_BYTES + len(costs) * OPEN_BYTES > self.memory:
+                return self.upper_bound(), False, count
+            for step_cost, new_state in self.moves(state):
+                new_cost = cost + step_cost
+                if new_cost < costs.get(new_state, new_cost + 1):
+                    costs[new_state] = new_cost
+                    estimate = new_cost if new_state == end else new_cost + self.heuristic(new_state)
+                    heapq.heappush(heap, (estimate, -new_cost, new_state))
+        return self.upper_bound(), False, count
+
+    def moves(self, state):
+        cell, direction, hp, items, killed = self.unpack(state)
+        moves = [(TURN_COST, self.pack(cell, (direction + 1) % 4, hp, items, killed)),
+                 (TURN_COST, self.pack(cell, (direction - 1) % 4, hp, items, killed))]
+        if cell == 0:
+            moves.append((GOLD_REWARD * bin(self.gold_mask & ~items).count('1'), -1))  # climb out
+        for cost, where, wumpus, gas, potion, gold in self.route(cell, direction):
+            new_hp, new_items, new_killed = hp, items | gold, killed
+            if wumpus and not killed & wumpus:
+                cost += SHOT_COST
+                new_killed |= wumpus
+            if gas:
+                new_hp -= 1
+            if potion and not items & potion:
+                new_hp = min(new_hp + 1, HP_STEPS)
+                new_items |= potion
+                cost += POTION_COST
+            if new_hp <= 0:
+                left = GOLD_REWARD * bin(self.gold_mask & ~new_items).count('1')
+                moves.append((cost + left, -1))  # died here
+            else:
+                moves.append((cost, where | new_hp << self.hp_shift | new_items << self.item_shift
+                               | new_killed << self.kill_shift))
+        return moves
+
+
+def solve_level(file_path, memory_mb=512, agent=True):
+    """Return a baseline row for one level: the oracle's score and, with agent, the agent's."""
+    start = time.perf_counter()
+    optimal, exact, states = Oracle(file_path, memory_mb).solve()
+    row = {'level': file_path, 'optimal': optimal, 'exact': exact, 'agent': None, 'percent': None,
+           'states': states, 'time': round(time.perf_counter() - start, 4)}
+    if agent:
+        from simulator import Simulator
+        score = Simulator(file_path, log_path=None).run().score
+        row['agent'] = score
+        if exact and optimal > 0:  # an upper bound would only understate the agent
+            row['percent'] = round(100 * score / optimal, 1)
+    return row
+
+
+def run_oracle(levels, workers=None, memory_mb=512, agent=True):
+    n = len(levels)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(solve_level, levels, [memory_mb] * n, [agent] * n))
+
+
+def main():
+    from batch import find_levels, format_table, write_summary
+    parser = argparse.ArgumentParser(description='Optimal scores of levels, next to the agent\'s')
+    parser.add_argument('levels', help='a level file, a directory or a glob of levels')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--memory-mb', type=int, default=512, help='visited table limit per level')
+    parser.add_argument('--no-agent', action='store_true', help='skip the agent runs')
+    parser.add_argument('--csv', help='also write the table to this CSV file')
+    args = parser.parse_args()
+
+    levels = [args.levels] if os.path.isfile(args.levels) else find_levels(args.levels)
+    rows = run_oracle(levels, args.workers, args.memory_mb, not args.no_agent)
+    print(format_table(rows, COLUMNS))
+    if args.csv:
+        write_summary(rows, args.csv, COLUMNS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import heapq
+from collections import deque
+from topology import RIGHT_OF, LEFT_OF
+
+TURN_COST = 10  # what turn_left/turn_right take off the score
+MOVE_COST = 1   # free in score, but shorter routes are still preferred
+
+
+class FrontierPlanner:
+    """Route the agent over known-safe cells to the cheapest frontier cell.
+
+    The frontier is the set of safe cells next to visited ones that have not
+    been visited yet. A cell proven safe stays safe, since the beliefs only
+    confirm a hazard where it is not ruled out, so frontier cells are not
+    checked again when a route is planned. Routes are planned with Dijkstra over (cell, direction)
+    states, so turns are charged their score cost, and a planned route is
+    reused for as long as its target and the cells on it stay valid. When no
+    safe frontier cell is left, pick_risky(position) may name an unproven
+    cell to head for instead of going home.
+    """
+
+    def __init__(self, topology, is_safe, pick_risky=None):
+        self.topology = topology
+        self.is_safe = is_safe
+        self.pick_risky = pick_risky
+        self.risky = None     # unproven cell the current route ends in
+        self.frontier = set()
+        self.route = deque()  # ('forward' | 'right' | 'left', cell the agent is in afterwards)
+        self.target = None
+        self.state = None     # (position, direction) the next route action expects
+
+    def add_frontier(self, position):
+        self.frontier.add(position)
+
+    def visit(self, position):
+        self.frontier.discard(position)
+
+    def route_valid(self, position, direction, home):
+        if not self.route or self.state != (position, direction):
+            return False
+        if self.target not in (home, self.risky) and self.target not in self.frontier:
+            return False
+        # Cells further along are checked as the agent reaches them
+        for action, cell in self.route:
+            if action == 'forward':
+                return cell == self.risky or self.is_safe(cell)
+        return True
+
+    def next_action(self, position, direction, home):
+        """Return the next action towards the best frontier cell, or home once
+        nothing is left to explore. Returns None when the agent is home with no
+        frontier left."""
+        if not self.route_valid(position, direction, home):
+            self.risky = None
+            self.target = None
+            if self.frontier:
+                self.target, self.route = self.plan(position, direction, self.frontier)
+            elif self.pick_risky is not None:
+                self.risky = self.pick_risky(position)
+                if self.risky is not None:
+                    self.target, self.route = self.plan(position, direction, {self.risky})
+            if self.target is None:
+                self.risky = None
+                if position == home:
+                    return None
+                self.target, self.route = self.plan(position, direction, {home})
+            if self.target is None:
+                self.route.clear()
+                return None
+
+        action, cell = self.route.popleft()
+        if action == 'forward':
+            self.state = (cell, direction)
+        elif action == 'right':
+            self.state = (position, RIGHT_OF[direction])
+        else:
+            self.state = (position, LEFT_OF[direction])
+        return action
+
+    def plan(self, position, direction, targets):
+        """Return (target, route) for the cheapest route to any target cell."""
+        start = (position, direction)
+        costs = {start: 0}
+        parents = {}
+        heap = [(0, 0, position, direction)]
+        counter = 1
+        while heap:
+            cost, _, cell, facing = heapq.heappop(heap)
+            if cost > costs[(cell, facing)]:
+                continue
+            if cell in targets and cell != position:
+                return cell, self.build_route(parents, (cell, facing))
+            ahead = self.topology.ahead(cell, facing)
+            moves = [((cell, RIGHT_OF[facing]), TURN_COST, 'right'),
+                     ((cell, LEFT_OF[facing]), TURN_COST, 'left')]
+            if ahead is not None and (ahead in targets or self.is_safe(ahead)):
+                moves.append(((ahead, facing), MOVE_COST, 'forward'))
+            for state, step_cost, action in moves:
+                new_cost = cost + step_cost
+                if new_cost < costs.get(state, new_cost + 1):
+                    costs[state] = new_cost
+                    parents[state] = ((cell, facing), action)
+                    heapq.heappush(heap, (new_cost, counter, state[0], state[1]))
+                    counter += 1
+        return None, deque()
+
+    def build_route(self, parents, state):
+        route = deque()
+        while state in parents:
+            previous, action = parents[state]
+            route.appendleft((action, state[0]))
+            state = previous
+        return route
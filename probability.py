@@ -0,0 +1,169 @@
+from beliefs import HAZARDS
+from levelgen import DENSITIES
+from instrument import events
+
+MAX_EXACT = 14  # largest component enumerated exactly; 2**14 assignments at most
+
+
+class HazardProbability:
+    """P(pit), P(wumpus) and P(gas) of the unproven cells next to visited ones.
+
+    Every visited cell that senses a percept says at least one of its
+    neighbours holds the hazard. Cells tied together by such constraints form
+    a component, and components are independent of each other, so each one is
+    solved on its own: by weighting every consistent assignment of its cells
+    with the hazard's density as prior, or, past MAX_EXACT cells, by the best
+    single-constraint estimate. The constraints and components are kept
+    from one estimate to the next, and only the ones around cells the
+    BeliefGrid reports as changed are worked out again. Results are cached
+    by the component's constraints, so a component that new percepts left
+    untouched is reused as it is.
+    """
+
+    def __init__(self, beliefs, priors=None, max_exact=MAX_EXACT):
+        self.beliefs = beliefs
+        self.priors = {element: DENSITIES[element] for element in HAZARDS} if priors is None else priors
+        self.max_exact = max_exact
+        self.cache = {}  # element -> {constraints: {cell index: probability}}
+        # element -> ({sensing cell: its constraint}, {component: its sensing cells},
+        # {constrained cell: its component}), kept up to date by components()
+        self.state = {}
+
+    def prior(self, x, y, element):
+        """Return the probability of the hazard in a cell no constraint covers."""
+        ruled_out, _, confirmed, _, _ = HAZARDS[element]
+        status = self.beliefs.status[x * self.beliefs.N + y]
+        if status & ruled_out:
+            return 0.0
+        if status & confirmed:
+            return 1.0
+        return self.priors[element]
+
+    def estimate(self, element):
+        """Return {cell index: probability} for every constrained unproven cell."""
+        cached = self.cache.get(element, {})
+        solved = {}
+        probabilities = {}
+        for constraints in self.components(element):
+            result = cached.get(constraints)
+            if result is None:
+                result = self.solve(constraints, self.priors[element])
+                if events.debug:
+                    events.emit('component', f"{element}: solved a component of {len(result)} cells")
+            solved[constraints] = result
+            probabilities.update(result)
+        self.cache[element] = solved  # components that changed are dropped
+        return probabilities
+
+    def constraint(self, element, i):
+        """Return the unproven cells around sensing cell i, or None if its hazard is found or it senses nothing."""
+        ruled_out, _, confirmed, bit, _ = HAZARDS[element]
+        if not self.beliefs.sensed[i] & bit:
+            return None
+        status = self.beliefs.status
+        cells = []
+        for j in self.beliefs.topology.neighbour_ids(i):
+            if status[j] & confirmed:
+                return None
+            if not status[j] & ruled_out:
+                cells.append(j)
+        return tuple(cells) or None
+
+    def components(self, element):
+        """Return the independent components, each a sorted tuple of constraints.
+
+        Only the components around the sensing cells the beliefs report as
+        changed are taken apart and joined again; the rest are kept as they were.
+        """
+        constraints, groups, group_of = self.state.setdefault(element, ({}, {}, {}))
+        pending = set()
+
+        def dissolve(cell):
+            key = group_of.get(cell)
+            if key is not None:
+                for cells in key:
+                    for j in cells:
+                        group_of.pop(j, None)
+                pending.update(groups.pop(key))
+
+        changed = self.beliefs.take_changed(element)
+        for i in changed:
+            if i in constraints:
+                dissolve(constraints[i][0])
+        for i in changed:
+            cells = self.constraint(element, i)
+            if cells is None:
+                constraints.pop(i, None)
+                pending.discard(i)
+            else:
+                constraints[i] = cells
+                pending.add(i)
+        # A new or grown constraint may reach into a component left alone so far
+        for i in list(pending):
+            for cell in constraints[i]:
+                dissolve(cell)
+
+        parent = {}
+
+        def root(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for i in pending:
+            cells = constraints[i]
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            first = root(cells[0])
+            for cell in cells[1:]:
+                parent[root(cell)] = first
+        members = {}
+        for i in pending:
+            members.setdefault(root(constraints[i][0]), []).append(i)
+        for group in members.values():
+            key = tuple(sorted({constraints[i] for i in group}))
+            groups[key] = group
+            for cells in key:
+                for cell in cells:
+                    group_of[cell] = key
+        return list(groups)
+
+    def solve(self, constraints, prior):
+        """Return {cell index: probability} for one component."""
+        cells = sorted({cell for group in constraints for cell in group})
+        if len(cells) > self.max_exact:
+            return self.approximate(constraints, prior)
+        index = {cell: k for k, cell in enumerate(cells)}
+        # Each constraint is checked once its last cell has a value
+        closing = [[] for _ in cells]
+        for group in constraints:
+            mask = sum(1 << index[cell] for cell in group)
+            closing[mask.bit_length() - 1].append(mask)
+        odds = prior / (1 - prior)
+        total = 0.0
+        marginals = [0.0] * len(cells)
+        stack = [(0, 0, 1.0)]  # (next cell, assignment so far, weight)
+        while stack:
+            k, assignment, weight = stack.pop()
+            if k == len(cells):
+                total += weight
+                while assignment:
+                    low = assignment & -assignment
+                    marginals[low.bit_length() - 1] += weight
+                    assignment ^= low
+                continue
+            for value, factor in ((0, 1.0), (1 << k, odds)):
+                new = assignment | value
+                if all(new & mask for mask in closing[k]):
+                    stack.append((k + 1, new, weight * factor))
+        return {cell: marginals[k] / total for k, cell in enumerate(cells)}
+
+    def approximate(self, constraints, prior):
+        """Estimate each cell from its most telling constraint alone."""
+        result = {}
+        for group in constraints:
+            p = prior / (1 - (1 - prior) ** len(group))
+            for cell in group:
+                result[cell] = max(result.get(cell, 0.0), p)
+        return result
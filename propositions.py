@@ -0,0 +1,38 @@
+import topology
+
+PIT, WUMPUS, GAS, POTION, BREEZE, STENCH, WHIFF, GLOW = range(8)
+NAMES = ('Pit', 'Wumpus', 'Gas', 'Potion', 'Breeze', 'Stench', 'Whiff', 'Glow')
+# Each hazard or item is sensed in the four neighbouring cells as its percept.
+PERCEPT_OF = {PIT: BREEZE, WUMPUS: STENCH, GAS: WHIFF, POTION: GLOW}
+
+
+class PropositionPool:
+    """Map each (predicate, x, y) proposition to a dense positive integer.
+
+    The IDs start at 1 so they double as pysat variables: a literal is the ID
+    for the proposition and its negation for "not" the proposition.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.topology = topology.grid(size)
+        self.cells = size * size
+        self.top = len(NAMES) * self.cells
+
+    def lit(self, predicate, position):
+        x, y = position
+        return predicate * self.cells + x * self.size + y + 1
+
+    def neighbours(self, position):
+        return self.topology.neighbours(position)
+
+    def decode(self, lit):
+        """Return (predicate, position, positive) for a literal."""
+        predicate, cell = divmod(abs(lit) - 1, self.cells)
+        return predicate, divmod(cell, self.size), lit > 0
+
+    def describe(self, lit):
+        """Return the human readable form of a literal, e.g. "not Pit at (3, 4)"."""
+        predicate, position, positive = self.decode(lit)
+        text = f"{NAMES[predicate]} at {position}"
+        return text if positive else f"not {text}"
@@ -0,0 +1,113 @@
+import json
+import re
+import world
+import topology
+from topology import DIRECTIONS, RIGHT_OF, LEFT_OF
+
+LINE = re.compile(r'^\((\d+), (\d+)\): (.*)$')
+
+
+def load_trace(file_path):
+    """Read a text or JSON Lines action log into a list of (position, action)."""
+    events = []
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                record = json.loads(line)
+                if 'action' in record:
+                    events.append((tuple(record['position']), record['action']))
+                continue
+            match = LINE.match(line)
+            if match:  # skips the Score/Hp trailer
+                events.append(((int(match.group(1)), int(match.group(2))), match.group(3).strip()))
+    return events
+
+
+class Replay:
+    """Play back a recorded action log on a level without an Agent or KnowledgeBase.
+
+    A keyframe of the grid, position, direction, score and HP is stored every
+    keyframe_interval actions, so seek(k) restores the closest keyframe at or
+    before k and replays at most keyframe_interval - 1 actions from there.
+    """
+
+    def __init__(self, level_path, trace_path, keyframe_interval=256):
+        self.N, self.grid = world.read_level(level_path)
+        self.topology = topology.grid(self.N)
+        self.grid.update_percepts()
+        self.events = load_trace(trace_path)
+        self.keyframe_interval = keyframe_interval
+        self.lines = [f"{position}: {action}" for position, action in self.events]
+        self.position = (0, 0)
+        self.direction = 'RIGHT'
+        self.score = 0
+        self.hp = 100
+        self.step = 0
+        self.action_log = []
+        self.keyframes = []
+        self.build_keyframes()
+
+    @property
+    def done(self):
+        return self.step >= len(self.events)
+
+    def finish(self):
+        pass
+
+    def keyframe(self):
+        return (self.grid.snapshot(), self.position, self.direction, self.score, self.hp)
+
+    def build_keyframes(self):
+        while True:
+            if self.step % self.keyframe_interval == 0:
+                self.keyframes.append(self.keyframe())
+            if self.done:
+                break
+            self.advance()
+        self.seek(0)
+
+    def advance(self):
+        """Apply the next recorded action, the way Agent applied it."""
+        position, action = self.events[self.step]
+        if position != self.position:
+            for direction in DIRECTIONS:
+                if self.topology.ahead(self.position, direction) == position:
+                    self.direction = direction
+            self.position = position
+            if self.grid.test(*position, 'W') or self.grid.test(*position, 'P'):
+                self.score -= 10000
+        if action == 'turn right':
+            self.direction = RIGHT_OF[self.direction]
+            self.score -= 10
+        elif action == 'turn left':
+            self.direction = LEFT_OF[self.direction]
+            self.score -= 10
+        elif action.startswith('-25 hp'):
+            self.hp -= 25
+        elif action == 'collected healing potion':
+            self.hp = min(self.hp + 25, 100)
+            self.score -= 10
+            self.grid.remove_hazard(*position, 'H_P')
+        elif action == 'collected gold':
+            self.score += 5000
+            self.grid.clear(*position, 'G')
+        elif action in ('shot Wumpus', 'shot missed'):
+            front = self.topology.ahead(position, self.direction)
+            if action == 'shot Wumpus':
+                self.grid.remove_hazard(*front, 'W')
+            self.score -= 100
+        self.action_log.append(self.lines[self.step])
+        self.step += 1
+
+    def seek(self, step):
+        """Jump to the state after the first `step` actions."""
+        step = max(0, min(step, len(self.events)))
+        if not self.step <= step < self.step + self.keyframe_interval:
+            index = step // self.keyframe_interval
+            cells, self.position, self.direction, self.score, self.hp = self.keyframes[index]
+            self.grid.restore(cells)
+            self.step = index * self.keyframe_interval
+            self.action_log = self.lines[:self.step]
+        while self.step < step:
+            self.advance()
@@ -0,0 +1,82 @@
+import time
+from agent import Agent
+import world
+
+
+class SimulationResult:
+    def __init__(self, score, hp, steps, action_log, outcome, elapsed):
+        self.score = score
+        self.hp = hp
+        self.steps = steps
+        self.action_log = action_log
+        self.outcome = outcome
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"SimulationResult(score={self.score}, hp={self.hp}, steps={self.steps}, "
+                f"outcome={self.outcome!r}, elapsed={self.elapsed:.3f}s)")
+
+
+class Simulator:
+    """Run an Agent on a level without pygame, as fast as the CPU allows.
+
+    The whole run state lives on the simulator, so a pickled Simulator is a
+    checkpoint that run() carries on from (see journal.py).
+    """
+
+    def __init__(self, file_path, max_steps=100000, entailment=False, log_path='output.txt', log_format='text'):
+        self.N, self.grid = world.read_level(file_path)
+        self.grid.update_percepts()
+        self.agent = Agent(self.N, entailment, log_path, log_format)
+        self.max_steps = max_steps
+        self.steps = 0
+        self.elapsed = 0.0
+        self.lap_start = None  # perf_counter() when elapsed was last brought up to date
+        self.started = False
+
+    def is_terminal(self):
+        return self.agent.done or self.agent.hp <= 0
+
+    def start(self):
+        self.agent.graphic = self.grid
+        self.agent.apply_percept(self.grid.cell(0, 0))
+        self.started = True
+
+    def step(self):
+        self.agent.decide_action()
+        self.steps += 1
+
+    def lap(self):
+        """Add the time run() has spent since the last lap to elapsed."""
+        now = time.perf_counter()
+        if self.lap_start is not None:
+            self.elapsed += now - self.lap_start
+        self.lap_start = now
+
+    def run(self, journal=None):
+        """Step the agent until it is back at the start, dead or out of steps.
+
+        With a journal.Journal every step is journaled and checkpointed.
+        """
+        self.lap_start = time.perf_counter()
+        if not self.started:
+            self.start()
+        if journal is not None:
+            journal.open(self)
+        while self.steps < self.max_steps and not self.is_terminal():
+            self.step()
+            if journal is not None:
+                journal.record(self)
+
+        if self.agent.hp <= 0:
+            outcome = 'dead'
+        elif self.agent.done:
+            outcome = 'returned'
+        else:
+            outcome = 'step_limit'
+        self.agent.finish()
+        self.lap()
+        if journal is not None:
+            journal.close(self)
+        return SimulationResult(self.agent.score, self.agent.hp, self.steps, list(self.agent.action_log),
+                                outcome, self.elapsed)
@@ -0,0 +1,22 @@
+import os
+import levelgen
+from batch import output_name, run_batch
+
+
+def test_output_name_keeps_the_path_below_root():
+    assert output_name('/suite/a/level1.txt', '/suite') == os.path.join('a', 'level1')
+    assert output_name('/suite/a/level1.txt') == 'level1'
+
+
+def test_levels_of_the_same_name_get_their_own_logs(tmp_path):
+    levels = []
+    for seed, folder in enumerate(('a', 'b')):
+        os.makedirs(tmp_path / 'suite' / folder)
+        levels.append(str(tmp_path / 'suite' / folder / 'level1.txt'))
+        levelgen.write_level(levels[-1], 8, seed)
+    output_dir = tmp_path / 'out'
+    rows = run_batch(levels, str(output_dir), workers=1, journal=True)
+    assert all(row['score'] is not None for row in rows)
+    for folder in ('a', 'b'):
+        assert (output_dir / folder / 'level1.txt').exists()
+        assert (output_dir / folder / 'level1.journal.ckpt').exists()
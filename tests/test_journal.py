@@ -0,0 +1,39 @@
+import pickle
+import levelgen
+from journal import Journal, read_records, run_journaled
+from simulator import Simulator
+
+
+def make_level(tmp_path):
+    level = str(tmp_path / 'level.txt')
+    levelgen.write_level(level, 40, 3)
+    return level
+
+
+def test_checkpoints_carry_elapsed(tmp_path):
+    level = make_level(tmp_path)
+    journal = Journal(str(tmp_path / 'run.journal'), 500)
+    simulator = Simulator(level, log_path=str(tmp_path / 'out.txt'), max_steps=1200)
+    simulator.run(journal)
+    with open(journal.checkpoint_path, 'rb') as f:
+        saved = pickle.load(f)['simulator']
+    assert saved.steps == 1200
+    assert saved.elapsed > 0.0
+
+
+def test_resume_after_crash_matches_a_straight_run(tmp_path):
+    level = make_level(tmp_path)
+    expected = Simulator(level, log_path=str(tmp_path / 'straight.txt')).run()
+    path = str(tmp_path / 'run.journal')
+    simulator = Simulator(level, log_path=str(tmp_path / 'out.txt'))
+    journal = Journal(path, 500)
+    simulator.start()
+    journal.open(simulator)
+    for _ in range(700):  # crash between checkpoints
+        simulator.step()
+        journal.record(simulator)
+    assert len(read_records(path)[0]) == 200  # on disk before the file is closed
+    journal.file.close()
+    result = run_journaled(path, level, 500)
+    assert (result.score, result.hp, result.steps) == (expected.score, expected.hp, expected.steps)
+    assert result.action_log == expected.action_log
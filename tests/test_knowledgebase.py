@@ -0,0 +1,124 @@
+import pickle
+import random
+import pytest
+from knowledgebase import KnowledgeBase
+from propositions import PIT, STENCH
+
+
+def random_lit(rng, kb):
+    return rng.choice((1, -1)) * rng.randint(1, 12)
+
+
+def random_ops(rng, kb, count):
+    for _ in range(count):
+        op = rng.randrange(5)
+        if op == 0:
+            kb.add_fact(random_lit(rng, kb))
+        elif op == 1:
+            kb.remove_fact(rng.choice(sorted(kb.asserted)) if kb.asserted else random_lit(rng, kb))
+        elif op in (2, 3):
+            kb.add_implication(random_lit(rng, kb), random_lit(rng, kb))
+        else:
+            kb.remove_related_implications(random_lit(rng, kb))
+
+
+def state(kb):
+    return (set(kb.facts), set(kb.asserted),
+            {key: list(items) for key, items in kb.by_premise.items()},
+            {key: list(items) for key, items in kb.by_conclusion.items()},
+            kb.rule_count, dict(kb.units), dict(kb.selectors))
+
+
+@pytest.mark.parametrize('entailment', [False, True])
+def test_rollback_restores_state(entailment):
+    for seed in range(300):
+        rng = random.Random(seed)
+        kb = KnowledgeBase(2, entailment)
+        random_ops(rng, kb, 20)
+        before = state(kb)
+        kb.checkpoint()
+        random_ops(rng, kb, 20)
+        kb.rollback()
+        assert state(kb) == before, f"seed {seed}"
+        assert kb.rule_count == sum(len(items) for items in kb.by_premise.values())
+
+
+def closure(kb):
+    facts = set(kb.asserted)
+    stack = list(facts)
+    while stack:
+        for conclusion in kb.by_premise.get(stack.pop(), ()):
+            if conclusion not in facts:
+                facts.add(conclusion)
+                stack.append(conclusion)
+    return facts
+
+
+def test_facts_are_closure_of_assertions():
+    for seed in range(3000):
+        rng = random.Random(seed)
+        kb = KnowledgeBase(2)
+        for _ in range(40):
+            random_ops(rng, kb, 1)
+            assert kb.facts == closure(kb), f"seed {seed}"
+
+
+def test_retracting_a_percept_keeps_the_solver():
+    kb = KnowledgeBase(4, entailment=True)
+    kb.observe((1, 1), {STENCH})
+    epoch = kb.epoch
+    stench = kb.pool.lit(STENCH, (1, 1))
+    assert kb.entails(stench)
+    kb.checkpoint()
+    kb.retract([stench])
+    assert not kb.entails(stench)
+    kb.add_unit(-stench)
+    assert kb.entails(-stench)
+    kb.rollback()
+    assert kb.entails(stench)
+    assert kb.epoch == epoch
+
+
+def test_pickle_rebuilds_axioms_and_solver():
+    kb = KnowledgeBase(6, entailment=True)
+    kb.observe((0, 0), set())
+    kb.observe((0, 1), {STENCH})
+    restored = pickle.loads(pickle.dumps(kb))
+    assert restored.axioms == kb.axioms
+    assert restored.units == kb.units
+    pit = kb.pool.lit(PIT, (1, 0))
+    assert restored.entails(-pit) == kb.entails(-pit)
+
+
+def random_solver_ops(rng, kb, lits, count):
+    for _ in range(count):
+        op = rng.randrange(4)
+        lit = rng.choice(lits) * rng.choice((1, -1))
+        if op == 0:
+            kb.add_unit(lit)
+        elif op == 1:
+            kb.retract([lit])
+        elif op == 2:
+            kb.add_to_cnf([lit, rng.choice(lits) * rng.choice((1, -1))])
+        elif kb.marks and rng.random() < 0.5:
+            kb.commit()
+        else:
+            kb.checkpoint()
+
+
+def test_commit_keeps_clauses_switched_on():
+    for seed in range(300):
+        rng = random.Random(seed)
+        kb = KnowledgeBase(3, entailment=True)
+        lits = [kb.pool.lit(element, (x, y)) for element in (PIT, STENCH) for x in range(3) for y in range(3)]
+        random_solver_ops(rng, kb, lits, 30)
+        while kb.marks:
+            kb.commit()
+        fresh = KnowledgeBase(3, entailment=True)
+        for lit in kb.units.values():
+            fresh.add_unit(lit)
+        for clause in kb.clauses:
+            fresh.add_to_cnf(clause)
+        for lit in lits:
+            assert kb.entails(lit) == fresh.entails(lit), f"seed {seed}"
+            assert kb.entails(-lit) == fresh.entails(-lit), f"seed {seed}"
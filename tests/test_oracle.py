@@ -0,0 +1,20 @@
+import levelgen
+from oracle import Oracle, solve_level
+
+
+def test_heuristic_keeps_the_optimum(tmp_path):
+    for seed in range(8):
+        level = str(tmp_path / f'level{seed}.txt')
+        levelgen.write_level(level, 12, seed)
+        guided = Oracle(level).solve()
+        plain = Oracle(level)
+        plain.heuristic = lambda state: 0  # Dijkstra
+        assert guided[:2] == plain.solve()[:2], f"seed {seed}"
+
+
+def test_no_percent_against_a_bound(tmp_path):
+    level = str(tmp_path / 'level.txt')
+    levelgen.write_level(level, 30, 0)
+    row = solve_level(level, memory_mb=1)
+    assert row['exact'] is False
+    assert row['percent'] is None
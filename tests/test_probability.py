@@ -0,0 +1,26 @@
+import random
+from beliefs import BeliefGrid, HAZARDS
+from probability import HazardProbability
+
+
+def rebuilt(beliefs, element):
+    """The components worked out from scratch, with a fresh HazardProbability."""
+    fresh = HazardProbability(beliefs)
+    beliefs.changed[element] = set(range(len(beliefs.sensed)))
+    return sorted(fresh.components(element))
+
+
+def test_components_follow_the_beliefs():
+    for seed in range(40):
+        rng = random.Random(seed)
+        beliefs = BeliefGrid(8)
+        odds = HazardProbability(beliefs)
+        for _ in range(30):
+            x, y = rng.randrange(8), rng.randrange(8)
+            if rng.random() < 0.2:
+                beliefs.forget(x, y, 'W')
+                beliefs.rule_out(x, y, 'W')
+            else:
+                beliefs.visit(x, y, rng.choice(['', 'S', 'W_H', 'B', 'S W_H']).split())
+            for element in HAZARDS:
+                assert sorted(odds.components(element)) == rebuilt(beliefs, element), f"seed {seed}"
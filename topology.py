@@ -0,0 +1,87 @@
+from array import array
+from functools import lru_cache
+
+DIRECTIONS = ('UP', 'RIGHT', 'DOWN', 'LEFT')  # clockwise
+STEP = {'UP': (-1, 0), 'RIGHT': (0, 1), 'DOWN': (1, 0), 'LEFT': (0, -1)}
+RIGHT_OF = {d: DIRECTIONS[(i + 1) % 4] for i, d in enumerate(DIRECTIONS)}
+LEFT_OF = {d: DIRECTIONS[(i - 1) % 4] for i, d in enumerate(DIRECTIONS)}
+DIRECTION_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+# Neighbour order, as the percept and rule code has always walked it
+NEIGHBOUR_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+# The cells a percept at a cell can point to when it was entered going each
+# way: straight on first, then the two sides
+FAN = {'UP': ('UP', 'LEFT', 'RIGHT'), 'DOWN': ('DOWN', 'LEFT', 'RIGHT'),
+       'LEFT': ('LEFT', 'UP', 'DOWN'), 'RIGHT': ('RIGHT', 'UP', 'DOWN')}
+
+
+class Topology:
+    """Neighbour and step lookup tables of a rows x cols grid, built once.
+
+    Cells are numbered x * cols + y. The neighbours of cell i are
+    adjacent[offsets[i]:offsets[i + 1]] (compressed sparse rows), and
+    step[i * 4 + d] is the cell ahead of i in direction DIRECTIONS[d], or -1
+    past the edge. around[i] and fan[i * 4 + d] hold the same cells as
+    (x, y) tuples for the code that works in positions, so a lookup neither
+    allocates nor checks bounds.
+    """
+
+    def __init__(self, rows, cols=None):
+        cols = rows if cols is None else cols
+        self.rows = rows
+        self.cols = cols
+        self.cells = rows * cols
+        self.positions = [divmod(i, cols) for i in range(self.cells)]
+        self.offsets = array('i', [0])
+        self.adjacent = array('i')
+        self.step = array('i', [-1] * (4 * self.cells))
+        for i, (x, y) in enumerate(self.positions):
+            for dx, dy in NEIGHBOUR_STEPS:
+                if 0 <= x + dx < rows and 0 <= y + dy < cols:
+                    self.adjacent.append((x + dx) * cols + y + dy)
+            self.offsets.append(len(self.adjacent))
+            for d, direction in enumerate(DIRECTIONS):
+                dx, dy = STEP[direction]
+                if 0 <= x + dx < rows and 0 <= y + dy < cols:
+                    self.step[i * 4 + d] = (x + dx) * cols + y + dy
+        self.around = [tuple(self.positions[j] for j in self.adjacent[self.offsets[i]:self.offsets[i + 1]])
+                       for i in range(self.cells)]
+        self.fan = [tuple(self.positions[j] for j in (self.step[i * 4 + DIRECTION_INDEX[way]] for way in FAN[direction])
+                          if j >= 0)
+                    for i in range(self.cells) for direction in DIRECTIONS]
+
+    def __reduce__(self):
+        # Pickled as its size, so an unpickled grid shares the cached tables
+        return grid, (self.rows, self.cols)
+
+    def contains(self, position):
+        x, y = position
+        return 0 <= x < self.rows and 0 <= y < self.cols
+
+    def index(self, position):
+        return position[0] * self.cols + position[1]
+
+    def neighbours(self, position):
+        """Return the (x, y) cells next to position."""
+        return self.around[position[0] * self.cols + position[1]]
+
+    def neighbour_ids(self, i):
+        return self.adjacent[self.offsets[i]:self.offsets[i + 1]]
+
+    def ahead(self, position, direction):
+        """Return the cell one step from position in direction, or None past the edge."""
+        j = self.step[(position[0] * self.cols + position[1]) * 4 + DIRECTION_INDEX[direction]]
+        return self.positions[j] if j >= 0 else None
+
+    def sensed_from(self, position, direction):
+        """Return the cells ahead and to the sides of position when facing direction."""
+        return self.fan[(position[0] * self.cols + position[1]) * 4 + DIRECTION_INDEX[direction]]
+
+
+def grid(rows, cols=None):
+    """Return the shared Topology of a rows x cols grid (square when cols is None)."""
+    return build(rows, rows if cols is None else cols)
+
+
+@lru_cache(maxsize=None)
+def build(rows, cols):
+    return Topology(rows, cols)
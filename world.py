@@ -0,0 +1,334 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+import topology
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the pure Python grid is used instead
+    np = None
+
+ELEMENTS = ('W', 'P', 'G', 'P_G', 'H_P', 'S', 'B', 'W_H', 'G_L')
+BIT = {element: 1 << i for i, element in enumerate(ELEMENTS)}
+PERCEPTS = {'W': 'S', 'P': 'B', 'P_G': 'W_H', 'H_P': 'G_L'}
+HAZARDS = tuple(PERCEPTS)  # elements whose percepts are reference counted
+# Element codes of every possible mask, in ELEMENTS order
+CONTENTS = [tuple(e for e in ELEMENTS if mask & BIT[e]) for mask in range(1 << len(ELEMENTS))]
+
+
+class BitGrid:
+    """Level contents as one bitmask per cell, one bit per element in ELEMENTS.
+
+    Backed by a (N, N) uint16 NumPy array, or by a flat array('H') when NumPy is
+    not installed; cells can hand in such an array, e.g. a mapped level file.
+
+    update_percepts() also counts, per cell and hazard type, the hazards next
+    to each cell. Hazards added or removed through add_hazard() and
+    remove_hazard() keep those counts, so a percept only goes out when no
+    hazard produces it any more, at O(1) per change.
+    """
+
+    def __init__(self, N, cells=None):
+        self.N = N
+        self.topology = topology.grid(N)
+        if cells is not None:
+            self.cells = cells
+        elif np is not None:
+            self.cells = np.zeros((N, N), dtype=np.uint16)
+        else:
+            self.cells = array('H', bytes(2 * N * N))
+        self.counts = None  # per hazard in HAZARDS, how many are next to each cell
+
+    def mask(self, x, y):
+        if np is not None:
+            return int(self.cells[x, y])
+        return self.cells[x * self.N + y]
+
+    def set_mask(self, x, y, mask):
+        if np is not None:
+            self.cells[x, y] = mask
+        else:
+            self.cells[x * self.N + y] = mask
+
+    def test(self, x, y, element):
+        return self.mask(x, y) & BIT[element] != 0
+
+    def set(self, x, y, element):
+        self.set_mask(x, y, self.mask(x, y) | BIT[element])
+
+    def clear(self, x, y, element):
+        self.set_mask(x, y, self.mask(x, y) & ~BIT[element])
+
+    def cell(self, x, y):
+        """Return the element codes in a cell, e.g. ('P', 'S')."""
+        return CONTENTS[self.mask(x, y)]
+
+    def snapshot(self):
+        """Return a copy of the cell masks to compare against with diff()."""
+        if np is not None:
+            return self.cells.copy()
+        return array('H', self.cells)
+
+    def restore(self, snapshot):
+        """Put back the cell masks from a snapshot, which stays unchanged."""
+        if np is not None:
+            self.cells = snapshot.copy()
+        else:
+            self.cells = array('H', snapshot)
+        self.counts = None  # counted again when a hazard next changes
+
+    def diff(self, snapshot):
+        """Return the (x, y) cells whose mask changed since snapshot was taken."""
+        if np is not None:
+            return [(x, y) for x, y in np.argwhere(self.cells != snapshot).tolist()]
+        return [divmod(i, self.N) for i, (a, b) in enumerate(zip(self.cells, snapshot)) if a != b]
+
+    def apply_percept(self, x, y, percept):
+        """Set a percept in the four cells next to (x, y)."""
+        for nx, ny in self.topology.around[x * self.N + y]:
+            self.set(nx, ny, percept)
+
+    def update_percepts(self):
+        """Add the stench, breeze, whiff and glow percepts around every hazard."""
+        self.count_percepts()
+        for i, element in enumerate(HAZARDS):
+            percept = BIT[PERCEPTS[element]]
+            if np is not None:
+                self.cells[self.counts[i] > 0] |= percept
+            else:
+                counts = self.counts[i]
+                for j in range(self.N * self.N):
+                    if counts[j]:
+                        self.cells[j] |= percept
+
+    def count_percepts(self):
+        """Count from scratch how many hazards of each type are next to every cell."""
+        if np is not None:
+            self.counts = np.stack([near_count((self.cells & BIT[element]) != 0) for element in HAZARDS])
+            return
+        self.counts = [array('B', bytes(self.N * self.N)) for _ in HAZARDS]
+        neighbour_ids = self.topology.neighbour_ids
+        for j, mask in enumerate(self.cells):
+            for i, element in enumerate(HAZARDS):
+                if mask & BIT[element]:
+                    for k in neighbour_ids(j):
+                        self.counts[i][k] += 1
+
+    def add_hazard(self, x, y, element):
+        """Put a hazard in (x, y); return the neighbours whose percept appeared."""
+        if self.test(x, y, element):
+            return []
+        if self.counts is None:
+            self.count_percepts()
+        self.set(x, y, element)
+        return self.shift_counts(x, y, element, 1)
+
+    def remove_hazard(self, x, y, element):
+        """Take a hazard out of (x, y); return the neighbours whose percept went out."""
+        if not self.test(x, y, element):
+            return []
+        if self.counts is None:
+            self.count_percepts()
+        self.clear(x, y, element)
+        return self.shift_counts(x, y, element, -1)
+
+    def shift_counts(self, x, y, element, delta):
+        index = HAZARDS.index(element)
+        percept = PERCEPTS[element]
+        counts = self.counts[index]
+        changed = []
+        for nx, ny in self.topology.around[x * self.N + y]:
+            if np is not None:
+                count = int(counts[nx, ny]) + delta
+                counts[nx, ny] = count
+            else:
+                count = counts[nx * self.N + ny] + delta
+                counts[nx * self.N + ny] = count
+            if delta > 0 and count == 1 and not self.test(nx, ny, percept):
+                self.set(nx, ny, percept)
+                changed.append((nx, ny))
+            elif delta < 0 and count == 0 and self.test(nx, ny, percept):
+                self.clear(nx, ny, percept)
+                changed.append((nx, ny))
+        return changed
+
+
+def near_any(plane):
+    """Return which cells have a True neighbour in a boolean (..., N, N) array."""
+    near = np.zeros_like(plane)
+    near[..., 1:, :] |= plane[..., :-1, :]
+    near[..., :-1, :] |= plane[..., 1:, :]
+    near[..., :, 1:] |= plane[..., :, :-1]
+    near[..., :, :-1] |= plane[..., :, 1:]
+    return near
+
+
+def near_count(plane):
+    """Return how many True neighbours each cell has in a boolean (..., N, N) array."""
+    count = np.zeros(plane.shape, dtype=np.uint8)
+    count[..., 1:, :] += plane[..., :-1, :]
+    count[..., :-1, :] += plane[..., 1:, :]
+    count[..., :, 1:] += plane[..., :, :-1]
+    count[..., :, :-1] += plane[..., :, 1:]
+    return count
+
+
+def parse_cell(text):
+    mask = 0
+    if text != '-':
+        for element in text.split(','):
+            mask |= BIT[element]
+    return mask
+
+
+def parse_level(text, file_path='<level>'):
+    """Parse the text level format into (N, BitGrid), checking the rows against N."""
+    lines = [line.strip() for line in text.splitlines()]
+    N = int(lines[0])  # First line is the grid size
+    rows = [line for line in lines[1:] if line]
+    if len(rows) != N:
+        raise ValueError(f"{file_path}: header says N={N} but the level has {len(rows)} rows")
+    grid = BitGrid(N)
+    masks = {}  # most cells repeat a handful of strings, so parse each one once
+    for x, line in enumerate(rows):
+        texts = line.split('.')
+        if len(texts) != N:
+            raise ValueError(f"{file_path}: row {x + 1} has {len(texts)} cells, expected {N}")
+        for y, cell in enumerate(texts):
+            mask = masks.get(cell)
+            if mask is None:
+                mask = masks[cell] = parse_cell(cell)
+            if mask:
+                grid.set_mask(x, y, mask)
+    return N, grid
+
+
+# Compiled levels: a header, then rows * cols little-endian uint16 cell masks.
+# The header records the text level it was compiled from, so a cache entry is
+# trusted while the text's mtime matches and re-hashed when it does not.
+MAGIC = b'WLVL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHq20sII')  # magic, version, reserved, source mtime_ns, source sha1, rows, cols
+CACHE_DIR = '__levelcache__'
+
+
+def cache_path(file_path):
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, CACHE_DIR, name + '.wlv')
+
+
+def write_binary(file_path, grid, mtime_ns=0, digest=bytes(20)):
+    """Write grid in the compiled format, via a temporary file so readers never see half of it."""
+    if np is not None:
+        data = grid.cells.astype('<u2').tobytes()
+    else:
+        cells = array('H', grid.cells)
+        if sys.byteorder == 'big':
+            cells.byteswap()
+        data = cells.tobytes()
+    tmp = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, mtime_ns, digest, grid.N, grid.N))
+        f.write(data)
+    os.replace(tmp, file_path)
+
+
+def read_header(file_path):
+    """Return the header fields of a compiled level, or None if it is not one."""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size or header[:4] != MAGIC:
+        return None
+    fields = HEADER.unpack(header)
+    if fields[1] != VERSION:
+        return None
+    return fields
+
+
+def read_binary(file_path):
+    """Memory-map a compiled level and return (N, BitGrid).
+
+    The mapping is copy-on-write, so the game can change the grid without
+    touching the file, and only the pages it changes are copied.
+    """
+    with open(file_path, 'rb') as f:
+        _, version, _, _, _, rows, cols = HEADER.unpack(f.read(HEADER.size))
+        size = HEADER.size + 2 * rows * cols
+        if rows != cols or os.fstat(f.fileno()).st_size != size:
+            raise ValueError(f"{file_path}: expected a {rows}x{cols} grid of {size} bytes")
+        mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY)
+    if np is not None:
+        cells = np.frombuffer(mapped, dtype='<u2', count=rows * cols, offset=HEADER.size)
+        return rows, BitGrid(rows, cells.astype(np.uint16, copy=False).reshape(rows, cols))
+    cells = array('H')
+    cells.frombytes(mapped[HEADER.size:size])
+    if sys.byteorder == 'big':
+        cells.byteswap()
+    return rows, BitGrid(rows, cells)
+
+
+def compile_level(file_path, binary_path=None):
+    """Compile a text level to binary_path (by default its cache file) and return that path."""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    mtime_ns = os.stat(file_path).st_mtime_ns
+    N, grid = parse_level(data.decode(), file_path)
+    binary_path = binary_path or cache_path(file_path)
+    os.makedirs(os.path.dirname(binary_path) or '.', exist_ok=True)
+    write_binary(binary_path, grid, mtime_ns, hashlib.sha1(data).digest())
+    return binary_path
+
+
+def read_level(file_path, cache=True):
+    """Read a text or compiled level file and return its size and a BitGrid of its contents.
+
+    With cache, a text level is compiled into __levelcache__ next to it the
+    first time it is read, and later reads map the compiled copy for as long
+    as the text is unchanged.
+    """
+    if read_header(file_path) is not None:
+        return read_binary(file_path)
+    if not cache:
+        with open(file_path, 'r') as f:
+            return parse_level(f.read(), file_path)
+
+    cached = cache_path(file_path)
+    header = read_header(cached)
+    mtime_ns = os.stat(file_path).st_mtime_ns
+    if header is not None and header[3] == mtime_ns:
+        return read_binary(cached)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).digest()
+    if header is not None and header[4] == digest:
+        # Touched but unchanged: remember the new mtime
+        N, grid = read_binary(cached)
+    else:
+        N, grid = parse_level(data.decode(), file_path)
+    try:
+        os.makedirs(os.path.dirname(cached) or '.', exist_ok=True)
+        write_binary(cached, grid, mtime_ns, digest)
+    except OSError:
+        pass  # read-only level directory: parse every time
+    return N, grid
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Compile text levels to the binary level format')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--output', help='output file (one input only); default: the level cache')
+    args = parser.parse_args()
+    if args.output and len(args.files) > 1:
+        parser.error('--output takes a single input file')
+    for file_path in args.files:
+        print(compile_level(file_path, args.output))
+
+if __name__ == "__main__":
+    main()